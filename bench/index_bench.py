@@ -0,0 +1,277 @@
+"""
+Offline indexing throughput benchmark
+
+Drives the real index pipeline (plugins.index.index_worker) or the
+per-file save_file path against a fake Telegram client, writing to a
+local mongod. Nothing talks to Telegram.
+
+    python bench/index_bench.py --messages 20000 --density 0.6 \
+        --latency-ms 80 --flood-rate 0.01
+
+Run it twice with the same arguments and --passes 2 to see the re-index
+(duplicate) path as well.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Offline indexing benchmark")
+    p.add_argument("--mongo", default="mongodb://localhost:27017", help="local mongod URL")
+    p.add_argument("--db", default="xfiler_bench", help="database used for the run")
+    p.add_argument("--mode", choices=("pipeline", "save_file"), default="pipeline")
+    p.add_argument("--messages", type=int, default=20000, help="channel size (message ids)")
+    p.add_argument("--density", type=float, default=0.6, help="share of ids carrying video/document")
+    p.add_argument("--empty-rate", type=float, default=0.05, help="share of deleted (empty) ids")
+    p.add_argument("--latency-ms", type=float, default=80, help="get_messages round trip")
+    p.add_argument("--jitter-ms", type=float, default=20)
+    p.add_argument("--flood-rate", type=float, default=0.0, help="chance a call raises FloodWait")
+    p.add_argument("--flood-seconds", type=int, default=3)
+    p.add_argument("--passes", type=int, default=1, help="re-run over the same channel")
+    p.add_argument("--bloom", action="store_true", help="enable the known-ids filter")
+    p.add_argument("--fast-ingest", action="store_true", help="INDEX_FAST_INGEST write concern")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--keep", action="store_true", help="keep the bench collection afterwards")
+    return p.parse_args()
+
+
+def bootstrap_env(args):
+    """Minimal config so info.py loads without a real bot"""
+    defaults = {
+        "API_ID": "1",
+        "API_HASH": "bench",
+        "BOT_TOKEN": "1:bench",
+        "ADMINS": "1",
+        "LOG_CHANNEL": "-1000000000001",
+        "INDEX_LOG_CHANNEL": "-1000000000001",
+        "SUPPORT_GROUP": "-1000000000001",
+        "BIN_CHANNEL": "-1000000000001",
+        "URL": "http://localhost/",
+        "DATA_DATABASE_URL": args.mongo,
+        "DATABASE_NAME": args.db,
+        "COLLECTION_NAME": "files_bench",
+        "INDEX_FAST_INGEST": "true" if args.fast_ingest else "false",
+        "INDEX_CATCHUP_INTERVAL": "0",
+        "PURGE_SWEEP_INTERVAL": "0",
+        "KNOWN_IDS_PATH": os.path.join(ROOT, "bench_known_ids.bloom"),
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+# =====================================================
+# 🤖 FAKE TELEGRAM CLIENT
+# =====================================================
+class FakeChannel:
+    """Deterministic synthetic channel: id -> message"""
+
+    def __init__(self, args, chat_id=-1001234567890):
+        from hydrogram import enums
+        from hydrogram.file_id import FileId, FileType
+
+        self.chat_id = chat_id
+        self.title = "Bench Channel"
+        rnd = random.Random(args.seed)
+        self.messages = {}
+
+        for msg_id in range(1, args.messages + 1):
+            roll = rnd.random()
+            if roll < args.empty_rate:
+                self.messages[msg_id] = SimpleNamespace(id=msg_id, empty=True, media=None)
+                continue
+            if roll > args.empty_rate + args.density:
+                self.messages[msg_id] = SimpleNamespace(
+                    id=msg_id, empty=False, media=None, caption=None
+                )
+                continue
+
+            kind = enums.MessageMediaType.VIDEO if rnd.random() < 0.7 else enums.MessageMediaType.DOCUMENT
+            file_type = FileType.VIDEO if kind == enums.MessageMediaType.VIDEO else FileType.DOCUMENT
+            file_id = FileId(
+                file_type=file_type,
+                dc_id=4,
+                media_id=msg_id,
+                access_hash=rnd.getrandbits(63),
+                file_reference=b""
+            ).encode()
+            season, episode = rnd.randint(1, 9), rnd.randint(1, 24)
+            quality = rnd.choice(("480p", "720p", "1080p", "2160p"))
+            media = SimpleNamespace(
+                file_id=file_id,
+                file_name=f"Show.{msg_id % 500}.S0{season}E{episode:02d}.{quality}.WEB-DL.mkv",
+                file_size=rnd.randint(50, 4000) * 1024 * 1024,
+                caption=None
+            )
+            msg = SimpleNamespace(
+                id=msg_id,
+                empty=False,
+                media=kind,
+                caption=f"Episode {episode} #bench",
+                chat=SimpleNamespace(id=chat_id, title=self.title)
+            )
+            setattr(msg, kind.value, media)
+            self.messages[msg_id] = msg
+
+    @property
+    def head(self):
+        return max(self.messages)
+
+
+class FakeClient:
+    """Just enough of hydrogram.Client for the indexer"""
+
+    def __init__(self, channel, args):
+        self.channel = channel
+        self.args = args
+        self.rnd = random.Random(args.seed + 1)
+        self.calls = 0
+        self.floods = 0
+
+    async def _delay(self):
+        jitter = self.rnd.uniform(-self.args.jitter_ms, self.args.jitter_ms)
+        await asyncio.sleep(max(0.0, self.args.latency_ms + jitter) / 1000)
+
+    async def get_messages(self, chat_id, ids):
+        from hydrogram.errors import FloodWait
+
+        self.calls += 1
+        await self._delay()
+        if self.args.flood_rate and self.rnd.random() < self.args.flood_rate:
+            self.floods += 1
+            raise FloodWait(value=self.args.flood_seconds)
+
+        if isinstance(ids, int):
+            return self.channel.messages.get(ids) or SimpleNamespace(id=ids, empty=True, media=None)
+        return [
+            self.channel.messages.get(i) or SimpleNamespace(id=i, empty=True, media=None)
+            for i in ids
+        ]
+
+    async def send_message(self, *args, **kwargs):
+        return None
+
+    async def delete_messages(self, *args, **kwargs):
+        return None
+
+
+# =====================================================
+# 🏁 RUNNERS
+# =====================================================
+async def run_pipeline(bot, channel):
+    from plugins.index import IndexJob, index_worker, clear_resume
+
+    await asyncio.to_thread(clear_resume, channel.chat_id)
+    job = IndexJob(channel.chat_id, channel.title, None, channel.head, 0)
+    job.state = "running"
+    job.started = time.time()
+
+    start = time.perf_counter()
+    await index_worker(bot, job)
+    elapsed = time.perf_counter() - start
+
+    stages = {
+        name: {
+            "items_per_s": round(m.rate, 1),
+            "batch_ms": round(m.latency_ms, 1),
+            "batches": m.calls
+        }
+        for name, m in job.meters.items()
+    }
+    return elapsed, dict(job.stats), stages
+
+
+async def run_save_file(bot, channel):
+    """Baseline: one get_messages + one save_file per id, like the old loop"""
+    from hydrogram.errors import FloodWait
+    from database.ia_filterdb import save_file
+
+    stats = {"scanned": 0, "saved": 0, "dup": 0, "skipped": 0, "err": 0, "nomedia": 0}
+    fetch_ms = write_ms = 0.0
+    writes = 0
+
+    start = time.perf_counter()
+    current = channel.head
+    while current > 0:
+        t = time.perf_counter()
+        try:
+            msg = await bot.get_messages(channel.chat_id, current)
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
+            continue
+        fetch_ms += (time.perf_counter() - t) * 1000
+        stats["scanned"] += 1
+        current -= 1
+
+        if not msg or getattr(msg, "empty", False) or not msg.media:
+            stats["nomedia"] += 1
+            continue
+
+        media = getattr(msg, msg.media.value)
+        media.caption = msg.caption
+        t = time.perf_counter()
+        res = await save_file(media)
+        write_ms += (time.perf_counter() - t) * 1000
+        writes += 1
+        # save_file returns suc/dup/err
+        stats[{"suc": "saved"}.get(res, res)] += 1
+    elapsed = time.perf_counter() - start
+
+    stages = {
+        "fetch": {"batch_ms": round(fetch_ms / max(stats["scanned"], 1), 1)},
+        "write": {"batch_ms": round(write_ms / max(writes, 1), 1)},
+    }
+    return elapsed, stats, stages
+
+
+def report(label, elapsed, stats, stages, bot, db_stats):
+    # dup includes files the known-ids filter skipped without a write
+    written = stats["saved"] + stats["dup"] - stats["skipped"]
+    print(f"\n=== {label} ===")
+    print(f"time          : {elapsed:.2f}s")
+    print(f"messages/s    : {stats['scanned'] / elapsed:.1f}")
+    print(f"db writes/s   : {written / elapsed:.1f}  (saved {stats['saved']}, dup {stats['dup']}, err {stats['err']})")
+    print(f"skipped       : {stats['skipped']}  (known unchanged, no write)")
+    print(f"non-media     : {stats['nomedia']}")
+    print(f"api calls     : {bot.calls}  (floodwaits {bot.floods})")
+    for name, st in stages.items():
+        print(f"stage {name:<7} : " + ", ".join(f"{k}={v}" for k, v in st.items()))
+    print(f"db executor   : avg {db_stats['avg_ms']}ms, max {db_stats['max_ms']}ms, ops {db_stats['ops']}")
+
+
+async def main():
+    args = parse_args()
+    bootstrap_env(args)
+
+    from database import ia_filterdb
+    from database.bloom import BloomFilter
+
+    if args.bloom:
+        ia_filterdb.KNOWN_IDS = BloomFilter(args.messages * 2)
+
+    channel = FakeChannel(args)
+    try:
+        for n in range(1, args.passes + 1):
+            bot = FakeClient(channel, args)
+            ia_filterdb.DB_STATS.update(calls=0, errors=0, timeouts=0, avg_ms=0.0, max_ms=0.0, ops={})
+
+            if args.mode == "pipeline":
+                elapsed, stats, stages = await run_pipeline(bot, channel)
+            else:
+                elapsed, stats, stages = await run_save_file(bot, channel)
+
+            report(f"{args.mode} pass {n}", elapsed, stats, stages, bot, ia_filterdb.db_executor_stats())
+    finally:
+        if not args.keep:
+            ia_filterdb.collection.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -29,11 +29,20 @@ from info import API_ID, API_HASH, BOT_TOKEN, PORT, LOG_CHANNEL, ADMINS
 from utils import (
     temp,
     cleanup_files_memory,
-    premium_expiry_reminder
+    premium_expiry_worker
 )
 
 from database.users_chats_db import db
+from database.ia_filterdb import (
+    build_search_index,
+    backfill_ngrams,
+    build_known_ids,
+    save_known_ids
+)
 from plugins.banned import auto_unban_worker
+from plugins.index import flush_checkpoints, catchup_worker
+from plugins.channel import flush_live_index, purge_sweep_worker
+from scheduler import deferred_worker, flush_deferred
 
 
 # ==========================
@@ -107,15 +116,33 @@ class Bot(Client):
         # 🔁 BACKGROUND TASKS
         # ==========================
 
+        # ⏲ DEFERRED ACTIONS (expiry / auto-delete, restored from db)
+        asyncio.create_task(deferred_worker(self))
+
         # 🔥 FILE MEMORY LEAK GUARD
         asyncio.create_task(cleanup_files_memory())
 
-        # 🔔 PREMIUM EXPIRY REMINDER
-        asyncio.create_task(premium_expiry_reminder(self))
+        # 🔔 PREMIUM EXPIRY + REMINDERS
+        asyncio.create_task(premium_expiry_worker(self))
 
         # 🚫 AUTO UNBAN WORKER
         asyncio.create_task(auto_unban_worker(self))
 
+        # 🧠 IN-MEMORY SEARCH INDEX WARM-UP (no-op unless enabled)
+        asyncio.create_task(build_search_index())
+
+        # 🔡 TRIGRAM BACKFILL FOR OLDER FILES
+        asyncio.create_task(backfill_ngrams())
+
+        # 🌸 KNOWN FILE IDS (load / rebuild + periodic snapshot)
+        asyncio.create_task(build_known_ids())
+
+        # 📡 FORWARD INDEX CATCH-UP (posts missed while offline)
+        asyncio.create_task(catchup_worker(self))
+
+        # 🧽 PURGE FILES OF DELETED CHANNEL POSTS
+        asyncio.create_task(purge_sweep_worker(self))
+
         # ---- admin notify ----
         for admin in ADMINS:
             try:
@@ -141,6 +168,11 @@ class Bot(Client):
         logger.info(f"Bot @{me.username} started successfully")
 
     async def stop(self, *args):
+        # 💾 persist index resume pointers + buffered live posts
+        await flush_checkpoints()
+        await flush_live_index(self)
+        await save_known_ids()
+        await flush_deferred(self)
         await super().stop()
         logger.info("Bot stopped cleanly")
 
@@ -0,0 +1,121 @@
+import os
+import math
+import struct
+import hashlib
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+_MAGIC = b"XFBF1"
+_HEADER = struct.Struct("<5sQQIQ")   # magic, capacity, bits, hashes, count
+
+
+# =====================================================
+# 🌸 BLOOM FILTER (KNOWN FILE IDS)
+# =====================================================
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys
+
+    "not in" is always right; "in" is wrong with probability about
+    error_rate while count stays under capacity. Deletes are not
+    supported, so a removed key keeps answering "maybe" until the
+    filter is rebuilt.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        capacity = max(int(capacity), 1000)
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(bits, 8)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.dirty = False
+
+    # -------------------------------------------------
+    # internal
+    # -------------------------------------------------
+    def _positions(self, key: Hashable):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    # -------------------------------------------------
+    # public API
+    # -------------------------------------------------
+    def add(self, key: Hashable) -> bool:
+        """Add a key; returns True if it was (probably) new"""
+        new = False
+        for pos in self._positions(key):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self.count += 1
+            self.dirty = True
+        return new
+
+    def update(self, keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        for pos in self._positions(key):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def saturated(self) -> bool:
+        """Past capacity the false positive rate climbs; rebuild bigger"""
+        return self.count > self.capacity
+
+    # -------------------------------------------------
+    # persistence
+    # -------------------------------------------------
+    def save(self, path: str) -> None:
+        """Atomically write the filter to disk"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.capacity, self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BloomFilter"]:
+        """Read a filter written by save(); None if missing or corrupt"""
+        try:
+            with open(path, "rb") as f:
+                magic, capacity, num_bits, num_hashes, count = _HEADER.unpack(f.read(_HEADER.size))
+                bits = f.read()
+        except (OSError, struct.error):
+            return None
+
+        if magic != _MAGIC or len(bits) != (num_bits + 7) // 8:
+            return None
+
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = math.exp(-num_hashes * math.log(2)) if num_hashes else 1.0
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        bloom.dirty = False
+        return bloom
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": self.count,
+            "capacity": self.capacity,
+            "bytes": len(self.bits),
+            "hashes": self.num_hashes
+        }
@@ -0,0 +1,269 @@
+import sys
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Hashable, Callable, Awaitable, Iterable
+
+_MISSING = object()
+
+
+# =====================================================
+# 📏 SIZE ESTIMATE
+# =====================================================
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """Rough deep size of plain containers (bytes)"""
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += approx_size(v, _depth + 1)
+    return size
+
+
+# =====================================================
+# ⚡ LRU + TTL CACHE
+# =====================================================
+class LRUCache:
+    """
+    O(1) LRU cache with per-entry TTL and an optional byte budget
+
+    Entries live in an OrderedDict ordered by last access, so eviction
+    is a popitem() from the cold end instead of a scan. Expired entries
+    are dropped on access, and from the cold end on every set. Entries
+    may carry tags so related keys can be invalidated together without
+    clearing the whole cache.
+
+    With touch=False reads do not reorder: the dict stays in insertion
+    order, which is expiry order when every entry uses the default ttl,
+    so dead entries leave from the head as new ones arrive.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_items: int = 1000,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        touch: bool = True
+    ):
+        self.name = name
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.touch = touch
+
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expire_at, size, tags)
+        self._tags: Dict[Hashable, set] = {}                          # tag -> keys
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # -------------------------------------------------
+    # internal
+    # -------------------------------------------------
+    def _drop(self, key: Hashable) -> None:
+        _, _, size, tags = self._data.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _expire_head(self) -> None:
+        now = time.monotonic()
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            if not entry[1] or entry[1] > now:
+                break
+            self._drop(key)
+            self.expirations += 1
+
+    def _shrink(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_items
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._drop(key)
+            self.evictions += 1
+
+    # -------------------------------------------------
+    # public API
+    # -------------------------------------------------
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expire_at = entry[0], entry[1]
+        if expire_at and expire_at <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        if self.touch:
+            self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[Hashable]] = None
+    ) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = time.monotonic() + ttl if ttl else 0
+        size = approx_size(value) if self.max_bytes else 0
+        tags = frozenset(tags) if tags else frozenset()
+
+        if key in self._data:
+            self._drop(key)
+
+        self._data[key] = (value, expire_at, size, tags)
+        self._bytes += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        self._expire_head()
+        self._shrink()
+
+    def invalidate_tags(self, tags: Iterable[Hashable]) -> int:
+        """Drop every entry carrying any of the tags"""
+        keys = set()
+        for tag in tags:
+            keys.update(self._tags.get(tag, ()))
+        for key in keys:
+            if key in self._data:
+                self._drop(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def peek(self, key: Hashable) -> bool:
+        """Live-entry check that does not touch LRU order or counters"""
+        entry = self._data.get(key)
+        return bool(entry) and not (entry[1] and entry[1] <= time.monotonic())
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        self._drop(key)
+        return entry[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._tags.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "items": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+    # -------------------------------------------------
+    # dict-style access (drop-in for the old temp.* dicts)
+    # -------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        if key not in self._data:
+            raise KeyError(key)
+        self._drop(key)
+
+
+# =====================================================
+# 🛫 SINGLE-FLIGHT (IN-FLIGHT DEDUPLICATION)
+# =====================================================
+class _LeaderCancelled(Exception):
+    """The leader was cancelled; its followers run the call themselves"""
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution
+
+    The first caller (leader) runs the coroutine; callers arriving while
+    it is in flight await the same future instead of repeating the work.
+    A cancelled leader does not cancel them: one of them takes over.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        fut = self._calls.get(key)
+        if fut is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(fut)
+            except _LeaderCancelled:
+                return await self.do(key, func, *args, **kwargs)
+
+        fut = asyncio.get_running_loop().create_future()
+        # leaders without followers must not leave an unretrieved exception
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = fut
+        self.leaders += 1
+
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            if not fut.done():
+                if isinstance(e, asyncio.CancelledError):
+                    fut.set_exception(_LeaderCancelled())
+                else:
+                    fut.set_exception(e)
+            raise
+        else:
+            if not fut.done():
+                fut.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "inflight": len(self._calls),
+            "leaders": self.leaders,
+            "shared": self.shared
+        }
@@ -2,20 +2,41 @@ import logging
 import re
 import base64
 import time
+import asyncio
+import json
 from struct import pack
-from datetime import datetime
-from typing import List, Tuple, Optional, Dict, Any
+from datetime import datetime, timedelta
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Dict, Any, Callable, NamedTuple
 
+import pymongo
 from hydrogram.file_id import FileId
-from pymongo import MongoClient, TEXT, ASCENDING
-from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo import MongoClient, TEXT, ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError, BulkWriteError
+from pymongo.write_concern import WriteConcern
 
 from info import (
     DATA_DATABASE_URL,
     DATABASE_NAME,
     COLLECTION_NAME,
     MAX_BTN,
-    USE_CAPTION_FILTER
+    USE_CAPTION_FILTER,
+    DB_MAX_WORKERS,
+    DB_SEARCH_TIMEOUT,
+    DB_WRITE_TIMEOUT,
+    INDEX_FAST_INGEST,
+    KNOWN_IDS_PATH,
+    USE_MEMORY_INDEX,
+    SEARCH_PREFETCH
+)
+from database.cache import LRUCache, SingleFlight
+from database.bloom import BloomFilter
+from database.search_index import (
+    InvertedIndex,
+    tokenize,
+    make_trigrams,
+    doc_trigrams
 )
 
 logger = logging.getLogger(__name__)
@@ -69,11 +90,108 @@ def ensure_indexes(col) -> None:
             col.create_index([("updated_at", ASCENDING)], name="updated_at_idx")
             logger.info("✅ Updated_at index created")
 
+        # Size index for "largest first" keyset paging
+        if "file_size_idx" not in indexes:
+            col.create_index([("file_size", ASCENDING)], name="file_size_idx")
+            logger.info("✅ File size index created")
+
+        # Trigram index for substring / typo tolerant search
+        if "ngrams_idx" not in indexes:
+            col.create_index([("ngrams", ASCENDING)], name="ngrams_idx")
+            logger.info("✅ Ngrams index created")
+
+        # Source posts lookup for purging deleted channel posts
+        if "sources_idx" not in indexes:
+            col.create_index(
+                [("sources.chat_id", ASCENDING), ("sources.msg_id", ASCENDING)],
+                name="sources_idx",
+                sparse=True
+            )
+            logger.info("✅ Sources index created")
+
     except Exception as e:
         logger.error(f"❌ Index creation error: {e}")
 
 ensure_indexes(collection)
 
+# =====================================================
+# ⚙️ ASYNC DB EXECUTOR
+# =====================================================
+# pymongo is blocking, so every files-collection call runs on a
+# bounded thread pool instead of the event loop. Each call gets a
+# client-side operation timeout (pymongo CSOT) so a slow query is
+# aborted on the server too, not just abandoned by the caller.
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=DB_MAX_WORKERS,
+    thread_name_prefix="files-db"
+)
+DB_SLOTS = asyncio.Semaphore(DB_MAX_WORKERS)
+
+DB_STATS: Dict[str, Any] = {
+    "calls": 0,
+    "errors": 0,
+    "timeouts": 0,
+    "inflight": 0,
+    "waiting": 0,
+    "avg_ms": 0.0,   # EWMA latency
+    "max_ms": 0.0,
+    "ops": {}        # op name -> calls
+}
+
+def _run_with_timeout(timeout: float, func: Callable, args, kwargs):
+    """Run a blocking pymongo call inside a CSOT timeout block"""
+    with pymongo.timeout(timeout):
+        return func(*args, **kwargs)
+
+async def run_db(op: str, func: Callable, *args, timeout: float = DB_SEARCH_TIMEOUT, **kwargs):
+    """
+    Run a blocking DB call on the files executor
+    Raises asyncio.TimeoutError / pymongo errors like the sync call would
+    """
+    loop = asyncio.get_running_loop()
+    DB_STATS["waiting"] += 1
+    async with DB_SLOTS:
+        DB_STATS["waiting"] -= 1
+        DB_STATS["inflight"] += 1
+        DB_STATS["calls"] += 1
+        DB_STATS["ops"][op] = DB_STATS["ops"].get(op, 0) + 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    DB_EXECUTOR,
+                    partial(_run_with_timeout, timeout, func, args, kwargs)
+                ),
+                timeout=timeout + 1
+            )
+        except asyncio.TimeoutError:
+            DB_STATS["timeouts"] += 1
+            logger.warning(f"DB op '{op}' timed out after {timeout}s")
+            raise
+        except PyMongoError as e:
+            if e.timeout:
+                DB_STATS["timeouts"] += 1
+                logger.warning(f"DB op '{op}' timed out after {timeout}s")
+            else:
+                DB_STATS["errors"] += 1
+            raise
+        except Exception:
+            DB_STATS["errors"] += 1
+            raise
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            DB_STATS["inflight"] -= 1
+            DB_STATS["avg_ms"] = DB_STATS["avg_ms"] * 0.9 + ms * 0.1
+            DB_STATS["max_ms"] = max(DB_STATS["max_ms"], ms)
+
+def db_executor_stats() -> Dict[str, Any]:
+    """Snapshot of executor counters"""
+    stats = dict(DB_STATS)
+    stats["ops"] = dict(DB_STATS["ops"])
+    stats["avg_ms"] = round(stats["avg_ms"], 2)
+    stats["max_ms"] = round(stats["max_ms"], 2)
+    return stats
+
 # =====================================================
 # 📊 DOCUMENT COUNT
 # =====================================================
@@ -86,37 +204,278 @@ def db_count_documents() -> int:
         return 0
 
 # =====================================================
-# ⚡ LIGHTWEIGHT CACHE
+# ⚡ SEARCH CACHE (LRU + TTL)
 # =====================================================
-SEARCH_CACHE: Dict[str, Tuple[Any, float]] = {}
 CACHE_TTL = 30  # seconds
 MAX_CACHE_SIZE = 1000
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+SEARCH_CACHE = LRUCache(
+    "search",
+    max_items=MAX_CACHE_SIZE,
+    ttl=CACHE_TTL,
+    max_bytes=MAX_CACHE_BYTES
+)
+
+# Totals change slowly and are expensive to recount, so they are cached
+# per (backend, query) with a longer TTL and shared by every page/sort.
+TOTAL_CACHE_TTL = 600  # seconds
+TOTAL_CACHE = LRUCache("totals", max_items=MAX_CACHE_SIZE * 5, ttl=TOTAL_CACHE_TTL)
 
 def cache_get(key: str) -> Optional[Any]:
     """Get cached value if not expired"""
-    v = SEARCH_CACHE.get(key)
-    if not v:
-        return None
-    
-    data, ts = v
-    if time.time() - ts > CACHE_TTL:
-        SEARCH_CACHE.pop(key, None)
-        return None
-    
-    return data
-
-def cache_set(key: str, value: Any) -> None:
-    """Set cache value with size limit"""
-    # Clean old entries if cache is too large
-    if len(SEARCH_CACHE) >= MAX_CACHE_SIZE:
-        oldest = min(SEARCH_CACHE.items(), key=lambda x: x[1][1])
-        SEARCH_CACHE.pop(oldest[0], None)
-    
-    SEARCH_CACHE[key] = (value, time.time())
+    return SEARCH_CACHE.get(key)
+
+def cache_set(key: str, value: Any, tags: Optional[set] = None) -> None:
+    """Set cache value (LRU eviction, byte bounded)"""
+    SEARCH_CACHE.set(key, value, tags=tags)
 
 def cache_clear() -> None:
     """Clear entire cache"""
     SEARCH_CACHE.clear()
+    TOTAL_CACHE.clear()
+
+def total_cache_get(key: str) -> Optional[int]:
+    """Get cached total if not expired"""
+    return TOTAL_CACHE.get(key)
+
+def total_cache_set(key: str, total: int, tags: Optional[set] = None) -> None:
+    """Set cached total"""
+    TOTAL_CACHE.set(key, total, tags=tags)
+
+# -----------------------------------------------------
+# TAGGED INVALIDATION
+# -----------------------------------------------------
+# Cached searches are tagged with their query tokens ("t:") and the
+# _ids on the page ("id:"). A write only drops entries whose tokens
+# intersect the mutated document's tokens or that contain its _id.
+# Tokens are bucketed by prefix so stemmed ($text) and prefix
+# substring queries ("aven" -> "avengers") still see new files.
+TAG_PREFIX_LEN = 4
+
+def token_tags(text: str) -> set:
+    """Cache tags for the tokens of a query or document"""
+    return {f"t:{tok[:TAG_PREFIX_LEN]}" for tok in tokenize(text)}
+
+def result_tags(q: str, files: List[Dict]) -> set:
+    """Tags for a cached search page"""
+    tags = token_tags(q)
+    tags.update(f"id:{f['_id']}" for f in files)
+    return tags
+
+def invalidate_files(docs: List[Dict]) -> int:
+    """Drop cached searches affected by mutated documents"""
+    tags = set()
+    for doc in docs:
+        if doc.get("_id"):
+            tags.add(f"id:{doc['_id']}")
+        tags |= token_tags(doc.get("file_name") or "")
+        if USE_CAPTION_FILTER:
+            tags |= token_tags(doc.get("caption") or "")
+
+    if not tags:
+        return 0
+    return SEARCH_CACHE.invalidate_tags(tags) + TOTAL_CACHE.invalidate_tags(tags)
+
+# Identical searches that miss the cache at the same time share one
+# backend execution instead of each hitting Mongo.
+SEARCH_FLIGHT = SingleFlight("search")
+
+def search_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters of the search caches"""
+    return {
+        "search": SEARCH_CACHE.stats(),
+        "totals": TOTAL_CACHE.stats(),
+        "singleflight": SEARCH_FLIGHT.stats(),
+        "prefetch": dict(PREFETCH_STATS)
+    }
+
+# =====================================================
+# 🧠 IN-MEMORY SEARCH INDEX (OPTIONAL)
+# =====================================================
+SEARCH_INDEX = InvertedIndex(use_caption=USE_CAPTION_FILTER)
+INDEX_BUILD_BATCH = 5000
+
+async def build_search_index() -> None:
+    """Warm the in-memory index from the files collection (startup task)"""
+    if not USE_MEMORY_INDEX or SEARCH_INDEX.ready:
+        return
+
+    start = time.time()
+    last_id = None
+    projection = {"file_name": 1, "file_size": 1, "caption": 1, "quality": 1}
+
+    try:
+        while True:
+            flt = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = collection.find(flt, projection).sort("_id", ASCENDING).limit(INDEX_BUILD_BATCH)
+            batch = await run_db("index_warm", list, cursor, timeout=DB_WRITE_TIMEOUT)
+            if not batch:
+                break
+
+            for doc in batch:
+                SEARCH_INDEX.add(doc, warm=True)
+
+            last_id = batch[-1]["_id"]
+            # let other updates run between batches
+            await asyncio.sleep(0)
+
+        SEARCH_INDEX.mark_ready()
+        logger.info(
+            f"✅ Memory index ready: {len(SEARCH_INDEX)} files "
+            f"in {time.time() - start:.1f}s"
+        )
+    except Exception as e:
+        logger.error(f"❌ Memory index build failed: {e}")
+
+# =====================================================
+# 🌸 KNOWN FILE IDS (BLOOM FILTER)
+# =====================================================
+# Lets the indexer tell certainly-new files (straight to the bulk
+# upsert) from probably-known ones, which are verified with one $in
+# lookup and skipped when nothing changed. A miss on the filter only
+# costs the normal write path, so it may lag the collection safely.
+KNOWN_IDS: Optional[BloomFilter] = None
+KNOWN_IDS_MIN_CAPACITY = 1_000_000
+KNOWN_IDS_SAVE_EVERY = 600   # seconds between snapshots to disk
+
+def remember_ids(ids) -> None:
+    if KNOWN_IDS is not None:
+        KNOWN_IDS.update(ids)
+
+async def save_known_ids() -> None:
+    """Snapshot the filter to KNOWN_IDS_PATH if it changed"""
+    bloom = KNOWN_IDS
+    if bloom is None or not bloom.dirty:
+        return
+    try:
+        await asyncio.to_thread(bloom.save, KNOWN_IDS_PATH)
+    except Exception as e:
+        logger.error(f"Known ids save failed: {e}")
+
+async def build_known_ids() -> None:
+    """Load the filter from disk or rebuild it, then snapshot (startup task)"""
+    global KNOWN_IDS
+
+    total = await run_db("known_count", db_count_documents)
+    bloom = await asyncio.to_thread(BloomFilter.load, KNOWN_IDS_PATH)
+
+    if bloom and bloom.capacity >= total and not bloom.saturated:
+        KNOWN_IDS = bloom
+        logger.info(f"✅ Known ids loaded from disk: {len(bloom)}")
+    else:
+        start = time.time()
+        # published first: saves during the scan land in it too
+        KNOWN_IDS = BloomFilter(max(KNOWN_IDS_MIN_CAPACITY, total * 2))
+        last_id = None
+        try:
+            while True:
+                flt = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = collection.find(flt, {"_id": 1}).sort("_id", ASCENDING).limit(INDEX_BUILD_BATCH)
+                batch = await run_db("known_scan", list, cursor, timeout=DB_WRITE_TIMEOUT)
+                if not batch:
+                    break
+                KNOWN_IDS.update(doc["_id"] for doc in batch)
+                last_id = batch[-1]["_id"]
+                await asyncio.sleep(0)
+            logger.info(f"✅ Known ids rebuilt: {len(KNOWN_IDS)} in {time.time() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"❌ Known ids build failed: {e}")
+            return
+
+    while True:
+        await save_known_ids()
+        await asyncio.sleep(KNOWN_IDS_SAVE_EVERY)
+
+# fields that must match for a re-indexed file to be skipped (its
+# source post must also be recorded already)
+VERIFY_FIELDS = ("caption", "quality", "file_size")
+
+def _unchanged(old: Dict, doc: Dict) -> bool:
+    if not all(old.get(k) == doc[k] for k in VERIFY_FIELDS if k in doc):
+        return False
+    have = old.get("sources") or []
+    return all(src in have for src in doc.get("sources", ()))
+
+async def drop_unchanged(docs: List[Dict]) -> Tuple[List[Dict], int]:
+    """
+    Drop docs whose stored copy already matches
+    Returns: (docs still to write, skipped count)
+    """
+    if KNOWN_IDS is None:
+        return docs, 0
+
+    maybe = [doc["_id"] for doc in docs if doc["_id"] in KNOWN_IDS]
+    if not maybe:
+        return docs, 0
+
+    # only a shortcut: if the check fails, write everything
+    try:
+        stored = await run_db(
+            "known_verify",
+            lambda: list(collection.find(
+                {"_id": {"$in": maybe}},
+                {k: 1 for k in VERIFY_FIELDS + ("sources",)}
+            ))
+        )
+    except Exception as e:
+        logger.warning(f"Known ids verify failed, writing batch in full: {e}")
+        return docs, 0
+    stored = {doc["_id"]: doc for doc in stored}
+
+    keep = []
+    for doc in docs:
+        old = stored.get(doc["_id"])
+        if old and _unchanged(old, doc):
+            continue
+        keep.append(doc)
+    return keep, len(docs) - len(keep)
+
+# =====================================================
+# 🔡 TRIGRAM BACKFILL
+# =====================================================
+# Documents saved before the ngrams field existed are backfilled in the
+# background; until that finishes the legacy regex scan stays as the
+# substring fallback so older files are not silently missed.
+NGRAM_STATE = {"ready": False, "backfilled": 0}
+NGRAM_BACKFILL_BATCH = 1000
+
+async def backfill_ngrams() -> None:
+    """Add the ngrams field to documents that predate it (startup task)"""
+    projection = {"file_name": 1, "caption": 1}
+    missing = {"ngrams": {"$exists": False}}
+
+    try:
+        while True:
+            cursor = collection.find(missing, projection).limit(NGRAM_BACKFILL_BATCH)
+            batch = await run_db("ngrams_scan", list, cursor, timeout=DB_WRITE_TIMEOUT)
+            if not batch:
+                break
+
+            ops = [
+                UpdateOne(
+                    {"_id": d["_id"]},
+                    {"$set": {"ngrams": doc_trigrams(
+                        d.get("file_name", ""),
+                        d.get("caption", ""),
+                        USE_CAPTION_FILTER
+                    )}}
+                )
+                for d in batch
+            ]
+            await run_db(
+                "ngrams_backfill",
+                collection.bulk_write, ops, ordered=False,
+                timeout=DB_WRITE_TIMEOUT
+            )
+            NGRAM_STATE["backfilled"] += len(ops)
+            await asyncio.sleep(0)
+
+        NGRAM_STATE["ready"] = True
+        if NGRAM_STATE["backfilled"]:
+            logger.info(f"✅ Ngrams backfilled for {NGRAM_STATE['backfilled']} files")
+    except Exception as e:
+        logger.error(f"❌ Ngrams backfill failed: {e}")
 
 # =====================================================
 # 🧠 QUALITY DETECTOR
@@ -141,100 +500,503 @@ def detect_quality(name: str) -> str:
     
     return "unknown"
 
+# =====================================================
+# 🧭 SORT MODES + KEYSET CURSORS
+# =====================================================
+SORT_RELEVANCE = "relevance"
+SORT_NEWEST = "newest"
+SORT_LARGEST = "largest"
+SORT_MODES = (SORT_RELEVANCE, SORT_NEWEST, SORT_LARGEST)
+
+# sort mode -> (document field, cursor key)
+SORT_FIELDS = {
+    SORT_NEWEST: ("updated_at", "u"),
+    SORT_LARGEST: ("file_size", "z"),
+}
+
+RESULT_PROJECTION = {
+    "file_name": 1,
+    "file_size": 1,
+    "caption": 1,
+    "quality": 1,
+    "updated_at": 1
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Pack a resume position into an opaque url-safe token"""
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Optional[Dict[str, Any]]:
+    """Unpack a cursor token (None if empty or malformed)"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(raw)
+        return state if isinstance(state, dict) and "m" in state else None
+    except Exception:
+        return None
+
+def _sort_value(doc: Dict, sort: str):
+    """Cursor-safe value of the sort field (datetimes as epoch ms)"""
+    field, _ = SORT_FIELDS[sort]
+    value = doc.get(field) or 0
+    if isinstance(value, datetime):
+        return (value - EPOCH) // timedelta(milliseconds=1)
+    return value
+
+def _sort_spec(sort: str) -> List[Tuple[str, int]]:
+    if sort == SORT_RELEVANCE:
+        return [("_id", ASCENDING)]
+    field, _ = SORT_FIELDS[sort]
+    return [(field, DESCENDING), ("_id", DESCENDING)]
+
+def _keyset(sort: str, after: Optional[Dict], by_score: bool = False) -> Optional[Dict]:
+    """Filter selecting everything strictly after the cursor position"""
+    if not after:
+        return None
+
+    if sort == SORT_RELEVANCE:
+        if by_score:
+            return {"$or": [
+                {"score": {"$lt": after["s"]}},
+                {"score": after["s"], "_id": {"$gt": after["i"]}}
+            ]}
+        return {"_id": {"$gt": after["i"]}}
+
+    field, key = SORT_FIELDS[sort]
+    value = after[key]
+    if sort == SORT_NEWEST:
+        value = EPOCH + timedelta(milliseconds=value)
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": after["i"]}}
+    ]}
+
+def _page(
+    method: str,
+    sort: str,
+    docs: List[Dict],
+    max_results: int,
+    by_score: bool = False
+) -> Tuple[List[Dict], Optional[Dict]]:
+    """Trim the n+1 probe row and build the next cursor state"""
+    if len(docs) <= max_results:
+        return docs, None
+
+    docs = docs[:max_results]
+    last = docs[-1]
+    state = {"m": method, "i": last["_id"]}
+    if sort == SORT_RELEVANCE:
+        if by_score:
+            state["s"] = last.get("score", 0)
+    else:
+        state[SORT_FIELDS[sort][1]] = _sort_value(last, sort)
+    return docs, state
+
 # =====================================================
 # 🔎 SMART SEARCH ENGINE
 # =====================================================
+# Each backend returns (files, total, next_state). next_state is None
+# on the last page; otherwise it is the resume position used to build
+# either the next skip offset or the next keyset cursor.
+SEARCH_METHODS = ("mem", "txt", "ng", "fz", "rx")
+
 async def get_search_results(
     query: str,
     offset: int = 0,
-    max_results: int = MAX_BTN
+    max_results: int = MAX_BTN,
+    sort: str = SORT_RELEVANCE,
+    cursor: Optional[str] = None
 ) -> Tuple[List[Dict], str, int]:
     """
-    Search files with text search + regex fallback
+    Search files with text search + trigram / regex fallback
     Returns: (files, next_offset, total_count)
+
+    Offset mode (default): next_offset is the next skip offset.
+    Cursor mode (cursor is not None, "" for the first page): pages
+    resume from the last seen (score|sort key, _id) instead of skipping,
+    and next_offset is the next cursor token.
     """
     # Validate input
     q = query.strip()
     if len(q) < 2:
         return [], "", 0
-    
-    q_lower = q.lower()
-    
+
+    sq = normalize_query(q)
+    if not sq.text:
+        return [], "", 0
+
+    if sort not in SORT_MODES:
+        sort = SORT_RELEVANCE
+
+    use_cursor = cursor is not None
+    after = decode_cursor(cursor) if cursor else None
+    if cursor and not after:
+        return [], "", 0
+
     # Check cache
-    cache_key = f"{q_lower}:{offset}"
+    cache_key = _search_cache_key(sq.key, sort, max_results, cursor, offset)
     cached = cache_get(cache_key)
     if cached:
         return cached
 
-    files = []
-    total = 0
+    # Concurrent identical misses await one execution
+    return await SEARCH_FLIGHT.do(
+        cache_key,
+        _execute_search,
+        cache_key, sq, offset, max_results, sort, use_cursor, after
+    )
 
-    # ===============================================
-    # METHOD 1: TEXT SEARCH (FAST & RELEVANT)
-    # ===============================================
-    text_filter = {"$text": {"$search": q}}
+def _search_cache_key(key: str, sort: str, max_results: int, cursor: Optional[str], offset: int) -> str:
+    return f"{key}:{sort}:{max_results}:{cursor if cursor is not None else offset}"
 
-    try:
-        cursor = collection.find(
-            text_filter,
-            {
-                "file_name": 1,
-                "file_size": 1,
-                "caption": 1,
-                "quality": 1,
-                "score": {"$meta": "textScore"},
-            }
-        ).sort([("score", {"$meta": "textScore"})]).skip(offset).limit(max_results)
-
-        files = list(cursor)
-        
-        if files:
-            # Count with limit for performance
-            total = collection.count_documents(text_filter, limit=10000)
+# -----------------------------------------------------
+# SPECULATIVE PREFETCH
+# -----------------------------------------------------
+# After a page is served the neighbouring pages are warmed in the
+# background so Next/Prev taps are answered from the cache. Prefetch
+# never queues: it is dropped when the budget is used up or when Mongo
+# is already slow or backed up.
+PREFETCH_CONCURRENCY = 4
+PREFETCH_MAX_DB_MS = 250   # skip while average DB latency is above this
 
-    except Exception as e:
-        logger.error(f"Text search error: {e}")
+PREFETCH_STATS = {"started": 0, "done": 0, "cached": 0, "busy": 0, "full": 0}
+_prefetch_inflight = 0
+
+def prefetch_search(
+    query: str,
+    offset: int = 0,
+    max_results: int = MAX_BTN,
+    sort: str = SORT_RELEVANCE,
+    cursor: Optional[str] = None
+) -> bool:
+    """Warm a results page in the background (returns True if started)"""
+    global _prefetch_inflight
 
-    # ===============================================
-    # METHOD 2: REGEX FALLBACK (SLOWER BUT ACCURATE)
-    # ===============================================
-    if not files:
+    q = query.strip()
+    if not SEARCH_PREFETCH or len(q) < 2 or offset < 0:
+        return False
+
+    key = normalize_query(q).key
+    if SEARCH_CACHE.peek(_search_cache_key(key, sort, max_results, cursor, offset)):
+        PREFETCH_STATS["cached"] += 1
+        return False
+
+    if DB_STATS["avg_ms"] > PREFETCH_MAX_DB_MS or DB_STATS["waiting"]:
+        PREFETCH_STATS["busy"] += 1
+        return False
+
+    if _prefetch_inflight >= PREFETCH_CONCURRENCY:
+        PREFETCH_STATS["full"] += 1
+        return False
+
+    async def _run():
+        global _prefetch_inflight
         try:
-            # Escape special regex characters
-            escaped_query = re.escape(q)
-            regex = re.compile(escaped_query, re.IGNORECASE)
-            
-            # Build filter based on caption setting
-            if USE_CAPTION_FILTER:
-                rg_filter = {"$or": [{"file_name": regex}, {"caption": regex}]}
-            else:
-                rg_filter = {"file_name": regex}
-
-            cursor = collection.find(
-                rg_filter,
-                {"file_name": 1, "file_size": 1, "caption": 1, "quality": 1}
-            ).skip(offset).limit(max_results)
-            
-            files = list(cursor)
-            
-            if files:
-                # Limit count for performance
-                total = min(
-                    collection.count_documents(rg_filter, limit=5000),
-                    5000
-                )
-        
+            await get_search_results(q, offset, max_results, sort, cursor)
+            PREFETCH_STATS["done"] += 1
         except Exception as e:
-            logger.error(f"Regex search error: {e}")
+            logger.warning(f"Prefetch error: {e}")
+        finally:
+            _prefetch_inflight -= 1
+
+    _prefetch_inflight += 1
+    PREFETCH_STATS["started"] += 1
+    asyncio.create_task(_run())
+    return True
+
+async def _execute_search(
+    cache_key: str,
+    sq: "SearchQuery",
+    offset: int,
+    max_results: int,
+    sort: str,
+    use_cursor: bool,
+    after: Optional[Dict]
+) -> Tuple[List[Dict], str, int]:
+    """Run the backends in order and cache the first non-empty page"""
+    # A cursor pins the backend (and filter strictness) of page one
+    methods = (after["m"],) if after else SEARCH_METHODS
+    skip = 0 if use_cursor else offset
+
+    # Quality / year filters are relaxed if they leave nothing
+    if after:
+        attempts = (sq if after.get("f", 1) else sq.relaxed(),)
+    elif sq.quality or sq.year:
+        attempts = (sq, sq.relaxed())
+    else:
+        attempts = (sq,)
+
+    files, total, state = [], 0, None
+    for attempt in attempts:
+        for method in methods:
+            try:
+                if method == "mem":
+                    files, total, state = _search_memory(attempt, skip, max_results, sort, after)
+                elif method == "txt":
+                    files, total, state = await _search_text(attempt, skip, max_results, sort, after)
+                elif method == "ng":
+                    files, total, state = await _search_ngrams(attempt, skip, max_results, sort, after)
+                elif method == "fz":
+                    files, total, state = await _search_fuzzy(attempt, skip, max_results, after)
+                elif method == "rx":
+                    files, total, state = await _search_regex(attempt, skip, max_results, sort, after)
+            except Exception as e:
+                logger.error(f"Search error ({method}): {e}")
+                files, total, state = [], 0, None
+
+            if files:
+                break
+        if files:
+            if state and attempt is not sq:
+                state["f"] = 0
+            break
+
+    # Calculate next offset / cursor
+    if not state:
+        next_offset = ""
+    elif use_cursor:
+        next_offset = encode_cursor(state)
+    else:
+        next_offset = str(offset + max_results)
 
-    # Calculate next offset
-    next_offset = str(offset + max_results) if total > offset + max_results else ""
-    
     result = (files, next_offset, total)
-    cache_set(cache_key, result)
+    cache_set(cache_key, result, result_tags(sq.text, files))
     
     return result
 
+# -----------------------------------------------------
+# STRUCTURED FILTERS (QUALITY / YEAR)
+# -----------------------------------------------------
+def _with_filters(match: Dict, sq: "SearchQuery") -> Dict:
+    """AND the query's quality / year filters onto a backend match"""
+    extra = []
+    if sq.quality:
+        extra.append({"quality": sq.quality})
+    if sq.year:
+        year = re.compile(rf"\b{sq.year}\b")
+        if USE_CAPTION_FILTER:
+            extra.append({"$or": [{"file_name": year}, {"caption": year}]})
+        else:
+            extra.append({"file_name": year})
+
+    if not extra:
+        return match
+    out = dict(match)
+    out["$and"] = list(out.get("$and", [])) + extra
+    return out
+
+def _word_trigrams(sq: "SearchQuery") -> List[str]:
+    """Trigrams of each query word (order independent)"""
+    grams = []
+    for tok in sq.tokens:
+        grams.extend(make_trigrams(tok))
+    return list(dict.fromkeys(grams))
+
+def _words_filter(sq: "SearchQuery") -> Dict:
+    """Every query word must appear in the name (or caption)"""
+    parts = []
+    for tok in sq.tokens:
+        regex = re.compile(re.escape(tok), re.IGNORECASE)
+        if USE_CAPTION_FILTER:
+            parts.append({"$or": [{"file_name": regex}, {"caption": regex}]})
+        else:
+            parts.append({"file_name": regex})
+    return {"$and": parts}
+
+# -----------------------------------------------------
+# METHOD 0: IN-MEMORY INDEX (NO DB ROUND TRIP)
+# -----------------------------------------------------
+def _search_memory(sq, skip, max_results, sort, after):
+    if not SEARCH_INDEX.ready or sort != SORT_RELEVANCE:
+        return [], 0, None
+
+    start = after["o"] if after else skip
+    hit = SEARCH_INDEX.search(sq.text, start, max_results, quality=sq.quality, year=sq.year)
+    if not hit:
+        return [], 0, None
+
+    files, total = hit
+    state = {"m": "mem", "o": start + max_results} if total > start + max_results else None
+    return files, total, state
+
+# -----------------------------------------------------
+# PAGE + TOTAL IN ONE ROUND TRIP
+# -----------------------------------------------------
+async def _aggregate_page(
+    op: str,
+    method: str,
+    match: Dict,
+    q_key: str,
+    skip: int,
+    max_results: int,
+    sort: str,
+    after: Optional[Dict],
+    count_limit: int,
+    by_score: bool = False
+) -> Tuple[List[Dict], int, Optional[Dict]]:
+    """
+    Run one aggregation that returns the page and, unless the total is
+    already cached, the (capped) match count via $facet
+    """
+    stages = [{"$match": match}]
+    if by_score:
+        stages.append({"$addFields": {"score": {"$meta": "textScore"}}})
+
+    page = []
+    keyset = _keyset(sort, after, by_score)
+    if keyset:
+        page.append({"$match": keyset})
+    if by_score:
+        page.append({"$sort": {"score": DESCENDING, "_id": ASCENDING}})
+    else:
+        page.append({"$sort": dict(_sort_spec(sort))})
+    if skip:
+        page.append({"$skip": skip})
+    page.append({"$limit": max_results + 1})
+    page.append({"$project": {**RESULT_PROJECTION, "score": 1} if by_score else RESULT_PROJECTION})
+
+    total_key = f"{method}:{q_key}"
+    total = total_cache_get(total_key)
+
+    if total is None:
+        stages.append({"$facet": {
+            "files": page,
+            "total": [{"$limit": count_limit}, {"$count": "n"}]
+        }})
+        out = await run_db(op, lambda: list(collection.aggregate(stages)))
+        facet = out[0] if out else {}
+        docs = facet.get("files", [])
+        counted = facet.get("total", [])
+        total = counted[0]["n"] if counted else 0
+        if docs:
+            total_cache_set(total_key, total, token_tags(q_key.split("|", 1)[0]))
+    else:
+        stages.extend(page)
+        docs = await run_db(op, lambda: list(collection.aggregate(stages)))
+
+    files, state = _page(method, sort, docs, max_results, by_score)
+    return files, total, state
+
+# -----------------------------------------------------
+# METHOD 1: TEXT SEARCH (FAST & RELEVANT)
+# -----------------------------------------------------
+async def _search_text(sq, skip, max_results, sort, after):
+    return await _aggregate_page(
+        "search_text", "txt",
+        _with_filters({"$text": {"$search": sq.text}}, sq),
+        sq.key, skip, max_results, sort, after,
+        count_limit=10000,
+        by_score=(sort == SORT_RELEVANCE)
+    )
+
+# -----------------------------------------------------
+# METHOD 2: TRIGRAM SUBSTRING / FUZZY MATCH
+# -----------------------------------------------------
+FUZZY_MIN_SIMILARITY = 0.6     # share of query trigrams a doc must contain
+FUZZY_MAX_RESULTS = 200
+FUZZY_CANDIDATE_LIMIT = 20000  # docs scored when only common trigrams match
+
+# docs per trigram, used to pick the most selective ones; counts only
+# steer candidate selection, so slightly stale values are harmless.
+# Counting stops at GRAM_COUNT_CAP: past it a trigram is just "common".
+GRAM_FREQ = LRUCache("gram_freq", max_items=50000, ttl=3600)
+GRAM_COUNT_CAP = 5000
+
+async def _gram_count(gram: str) -> int:
+    try:
+        n = await run_db(
+            "gram_freq",
+            collection.count_documents, {"ngrams": gram}, limit=GRAM_COUNT_CAP
+        )
+    except Exception as e:
+        # cached as common, so the next search does not pay for it again
+        logger.warning(f"Trigram count failed ({gram}): {e}")
+        n = GRAM_COUNT_CAP
+    GRAM_FREQ.set(gram, n)
+    return n
+
+async def _rarest_grams(grams: List[str], keep: int) -> List[str]:
+    """The `keep` trigrams carried by the fewest files"""
+    missing = [g for g in grams if not GRAM_FREQ.peek(g)]
+    if missing:
+        await asyncio.gather(*(_gram_count(g) for g in missing))
+    return sorted(grams, key=lambda g: GRAM_FREQ.get(g, GRAM_COUNT_CAP))[:keep]
+
+async def _search_ngrams(sq, skip, max_results, sort, after):
+    if not NGRAM_STATE["ready"]:
+        return [], 0, None
+
+    grams = _word_trigrams(sq)
+    if not grams:
+        return [], 0, None
+
+    # every query trigram must be present before the regexes run
+    match = {"$and": [{"ngrams": {"$all": grams}}] + _words_filter(sq)["$and"]}
+
+    return await _aggregate_page(
+        "search_ngrams", "ng",
+        _with_filters(match, sq),
+        sq.key, skip, max_results, sort, after,
+        count_limit=5000
+    )
+
+async def _search_fuzzy(sq, skip, max_results, after):
+    """Typo tolerant match ranked by shared trigrams (always by relevance)"""
+    if not NGRAM_STATE["ready"]:
+        return [], 0, None
+
+    grams = _word_trigrams(sq)
+    if not grams:
+        return [], 0, None
+
+    need = max(1, int(len(grams) * FUZZY_MIN_SIMILARITY + 0.5))
+
+    # a file sharing `need` of the n trigrams must carry at least one of
+    # any n - need + 1 of them: matching on the rarest ones drops no
+    # candidate, and every candidate is scored before the top-k sort.
+    # Queries made only of common trigrams score a bounded sample.
+    rare = await _rarest_grams(grams, len(grams) - need + 1)
+    pipeline = [
+        {"$match": _with_filters({"ngrams": {"$in": rare}}, sq)},
+        {"$limit": FUZZY_CANDIDATE_LIMIT},
+        {"$project": {
+            **RESULT_PROJECTION,
+            "hits": {"$size": {"$setIntersection": ["$ngrams", grams]}}
+        }},
+        {"$match": {"hits": {"$gte": need}}},
+        {"$sort": {"hits": DESCENDING, "_id": ASCENDING}},
+        {"$limit": FUZZY_MAX_RESULTS}
+    ]
+    ranked = await run_db(
+        "search_fuzzy",
+        lambda: list(collection.aggregate(pipeline))
+    )
+
+    # result set is capped, so it is paged by position
+    start = after["o"] if after else skip
+    total = len(ranked)
+    state = {"m": "fz", "o": start + max_results} if total > start + max_results else None
+    return ranked[start:start + max_results], total, state
+
+# -----------------------------------------------------
+# METHOD 3: REGEX FALLBACK (UNTIL NGRAMS ARE READY)
+# -----------------------------------------------------
+async def _search_regex(sq, skip, max_results, sort, after):
+    if NGRAM_STATE["ready"] and _word_trigrams(sq):
+        return [], 0, None
+
+    return await _aggregate_page(
+        "search_regex", "rx",
+        _with_filters(_words_filter(sq), sq),
+        sq.key, skip, max_results, sort, after,
+        count_limit=5000
+    )
+
 # =====================================================
 # 🗑 DELETE FILES
 # =====================================================
@@ -246,11 +1008,31 @@ async def delete_files(query: str) -> int:
     try:
         escaped_query = re.escape(query.strip())
         regex = re.compile(escaped_query, re.IGNORECASE)
-        
-        res = collection.delete_many({"file_name": regex})
-        
-        # Clear cache after deletion
-        cache_clear()
+
+        # Resolve docs first so in-memory state can be updated precisely
+        docs = await run_db(
+            "delete_scan",
+            lambda: list(collection.find(
+                {"file_name": regex},
+                {"file_name": 1, "caption": 1}
+            )),
+            timeout=DB_WRITE_TIMEOUT
+        )
+        if not docs:
+            return 0
+        ids = [d["_id"] for d in docs]
+
+        res = await run_db(
+            "delete_many",
+            collection.delete_many, {"_id": {"$in": ids}},
+            timeout=DB_WRITE_TIMEOUT
+        )
+
+        for file_id in ids:
+            SEARCH_INDEX.remove(file_id)
+
+        # Drop only the cached searches these files could appear in
+        invalidate_files(docs)
         
         return res.deleted_count
     
@@ -258,6 +1040,93 @@ async def delete_files(query: str) -> int:
         logger.error(f"Delete error: {e}")
         return 0
 
+# =====================================================
+# 🧽 PURGE DELETED CHANNEL POSTS
+# =====================================================
+async def delete_by_source(chat_id: int, msg_ids: List[int]) -> int:
+    """
+    Forget deleted source posts (chat_id, msg_id); a file is deleted only
+    once none of the posts carrying it is left
+    """
+    if not msg_ids:
+        return 0
+
+    gone = {"chat_id": chat_id, "msg_id": {"$in": list(msg_ids)}}
+    try:
+        hit = await run_db(
+            "purge_scan",
+            lambda: collection.distinct("_id", {"sources": {"$elemMatch": gone}}),
+            timeout=DB_WRITE_TIMEOUT
+        )
+        if not hit:
+            return 0
+
+        await run_db(
+            "purge_pull",
+            collection.update_many, {"_id": {"$in": hit}}, {"$pull": {"sources": gone}},
+            timeout=DB_WRITE_TIMEOUT
+        )
+
+        orphans = {"_id": {"$in": hit}, "sources": {"$size": 0}}
+        docs = await run_db(
+            "purge_orphans",
+            lambda: list(collection.find(orphans, {"file_name": 1, "caption": 1})),
+            timeout=DB_WRITE_TIMEOUT
+        )
+        if not docs:
+            return 0
+        ids = [d["_id"] for d in docs]
+
+        res = await run_db(
+            "purge_many",
+            collection.delete_many, {"_id": {"$in": ids}, "sources": {"$size": 0}},
+            timeout=DB_WRITE_TIMEOUT
+        )
+
+        for file_id in ids:
+            SEARCH_INDEX.remove(file_id)
+        invalidate_files(docs)
+
+        return res.deleted_count
+
+    except Exception as e:
+        logger.error(f"Purge error: {e}")
+        return 0
+
+async def get_max_source_id(chat_id: int) -> Optional[int]:
+    """Newest stored source message id of a channel (None if unknown)"""
+    doc = await run_db(
+        "source_head",
+        lambda: next(collection.aggregate([
+            {"$match": {"sources.chat_id": chat_id}},
+            # a repost elsewhere can rank a doc high: look a few deep
+            {"$sort": {"sources.msg_id": DESCENDING}},
+            {"$limit": 50},
+            {"$unwind": "$sources"},
+            {"$match": {"sources.chat_id": chat_id}},
+            {"$group": {"_id": None, "head": {"$max": "$sources.msg_id"}}}
+        ]), None)
+    )
+    return doc["head"] if doc else None
+
+async def get_source_ids(chat_id: int, after: int, upto: int) -> List[int]:
+    """
+    Stored source message ids of a channel in (after, upto], ascending.
+    The sweep pages over fixed id windows so every call is an index range.
+    """
+    window = {"chat_id": chat_id, "msg_id": {"$gt": after, "$lte": upto}}
+    docs = await run_db(
+        "source_scan",
+        lambda: list(collection.aggregate([
+            {"$match": {"sources": {"$elemMatch": window}}},
+            {"$unwind": "$sources"},
+            {"$match": {"sources.chat_id": chat_id, "sources.msg_id": window["msg_id"]}},
+            {"$group": {"_id": "$sources.msg_id"}},
+            {"$sort": {"_id": ASCENDING}}
+        ]))
+    )
+    return [d["_id"] for d in docs]
+
 # =====================================================
 # 📄 GET FILE DETAILS
 # =====================================================
@@ -267,7 +1136,7 @@ async def get_file_details(file_id: str) -> Optional[Dict]:
         return None
     
     try:
-        return collection.find_one({"_id": file_id})
+        return await run_db("find_one", collection.find_one, {"_id": file_id})
     except Exception as e:
         logger.error(f"Get file error: {e}")
         return None
@@ -288,9 +1157,101 @@ def clean_text(text: str) -> str:
     
     return cleaned.strip()
 
+# =====================================================
+# 🧭 QUERY NORMALIZER
+# =====================================================
+# Every search is reduced to a canonical form before it touches a
+# cache or a backend, so "Avengers Endgame 1080p", "avengers  endgame"
+# and "endgame avengers movie" share one cache entry, one in-flight
+# execution and one analytics key.
+STOPWORDS = frozenset({
+    "a", "an", "the", "of", "and", "in", "on", "to", "for", "with", "by",
+    "movie", "movies", "film", "films", "download", "downloads", "hd",
+    "full", "free", "watch", "online", "link", "links", "file", "files",
+    "send", "pls", "please", "plz", "new", "latest"
+})
+
+YEAR_RE = re.compile(r"\b(19[0-9]{2}|20[0-9]{2})\b")
+
+class SearchQuery(NamedTuple):
+    key: str                  # stable cache / single-flight / analytics key
+    text: str                 # sorted tokens joined by spaces
+    tokens: Tuple[str, ...]
+    quality: Optional[str]
+    year: Optional[str]
+
+    def relaxed(self) -> "SearchQuery":
+        """Same tokens without the structured filters"""
+        return self._replace(key=self.text, quality=None, year=None)
+
+def normalize_query(query: str) -> SearchQuery:
+    """Canonicalize a raw user query"""
+    cleaned = clean_text(query or "").lower()
+
+    # ---- structured parts ----
+    quality = None
+    rest = cleaned
+    for pattern, label in QUALITY_PATTERNS:
+        if pattern.search(rest):
+            quality = label
+            rest = pattern.sub(" ", rest)
+            break
+
+    year = None
+    m = YEAR_RE.search(rest)
+    if m:
+        year = m.group(1)
+        rest = YEAR_RE.sub(" ", rest, count=1)
+
+    # ---- tokens ----
+    words = tokenize(rest)
+    if not words:
+        # query was only a filter ("2019", "1080p"): search it as text
+        words = tokenize(cleaned)
+        quality = year = None
+
+    # filler is dropped unless it is all there is ("the movie")
+    tokens = [t for t in words if t not in STOPWORDS] or words
+
+    tokens = tuple(sorted(dict.fromkeys(tokens)))
+    text = " ".join(tokens)
+
+    key = text
+    if quality:
+        key += f"|q={quality}"
+    if year:
+        key += f"|y={year}"
+
+    return SearchQuery(key, text, tokens, quality, year)
+
 # =====================================================
 # 💾 SAVE / UPDATE FILE
 # =====================================================
+def build_file_doc(media, source: Optional[Tuple[int, int]] = None) -> Optional[Dict]:
+    """
+    Normalize a media object into a files document (None if invalid)
+    source: (chat_id, msg_id) of the channel post carrying the file
+    """
+    if not media or not hasattr(media, 'file_id'):
+        return None
+
+    # Clean and prepare data
+    file_name = clean_text(getattr(media, 'file_name', None) or "Untitled")
+    caption = clean_text(getattr(media, 'caption', None) or "")
+
+    doc = {
+        "_id": unpack_new_file_id(media.file_id),
+        "file_name": file_name,
+        "file_size": getattr(media, 'file_size', 0),
+        "caption": caption,
+        "quality": detect_quality(file_name),
+        "ngrams": doc_trigrams(file_name, caption, USE_CAPTION_FILTER),
+        "updated_at": datetime.utcnow()
+    }
+    if source:
+        doc["sources"] = [{"chat_id": source[0], "msg_id": source[1]}]
+    return doc
+
 async def save_file(media) -> str:
     """
     Save or update file in database
@@ -298,54 +1259,179 @@ async def save_file(media) -> str:
     """
     try:
         # Validate input
-        if not media or not hasattr(media, 'file_id'):
+        doc = build_file_doc(media)
+        if not doc:
             return "err"
-        
-        # Generate unique file ID
-        file_id = unpack_new_file_id(media.file_id)
-        
-        # Clean and prepare data
-        file_name = clean_text(getattr(media, 'file_name', None) or "Untitled")
-        caption = clean_text(getattr(media, 'caption', None) or "")
-        file_size = getattr(media, 'file_size', 0)
-        
-        # Detect quality
-        quality = detect_quality(file_name)
-
-        # Prepare document
-        doc = {
-            "_id": file_id,
-            "file_name": file_name,
-            "file_size": file_size,
-            "caption": caption,
-            "quality": quality,
-            "updated_at": datetime.utcnow()
-        }
+
+        file_id = doc["_id"]
+        caption = doc["caption"]
+        quality = doc["quality"]
+        file_size = doc["file_size"]
 
         # Try insert (new file)
         try:
-            collection.insert_one(doc)
+            await run_db(
+                "insert_one",
+                collection.insert_one, doc,
+                timeout=DB_WRITE_TIMEOUT
+            )
+            SEARCH_INDEX.add(doc)
+            remember_ids([file_id])
+            invalidate_files([doc])
             return "suc"
 
         except DuplicateKeyError:
             # File exists, update caption and quality
-            collection.update_one(
+            await run_db(
+                "update_one",
+                collection.update_one,
                 {"_id": file_id},
                 {
                     "$set": {
                         "caption": caption,
                         "quality": quality,
                         "file_size": file_size,
+                        "ngrams": doc["ngrams"],
                         "updated_at": datetime.utcnow()
                     }
-                }
+                },
+                timeout=DB_WRITE_TIMEOUT
+            )
+            SEARCH_INDEX.update(
+                file_id,
+                caption=caption,
+                quality=quality,
+                file_size=file_size
             )
+            remember_ids([file_id])
+            # name is unchanged on dup; caption tokens may be new
+            invalidate_files([{"_id": file_id, "caption": caption}])
             return "dup"
 
     except Exception as e:
         logger.error(f"Save file error: {e}")
         return "err"
 
+# =====================================================
+# 📦 BULK SAVE (INDEXER)
+# =====================================================
+# Fields refreshed when a file is seen again; everything else is only
+# written on first insert (same semantics as save_file). Source posts
+# accumulate: a repost in another channel adds to them.
+UPSERT_FIELDS = ("caption", "quality", "file_size", "ngrams", "updated_at")
+
+# Fast ingest trades journal durability for throughput on backfills
+FAST_INGEST_CONCERN = WriteConcern(w=1, j=False)
+
+async def save_files_bulk(
+    medias: List[Any],
+    fast: Optional[bool] = None,
+    sources: Optional[List[Tuple[int, int]]] = None
+) -> Dict[str, int]:
+    """
+    Save a batch of media objects with one unordered bulk upsert
+    sources: optional (chat_id, msg_id) per media
+    Returns: {'suc': new, 'dup': updated, 'err': failed}
+    """
+    docs, bad = [], 0
+    for i, media in enumerate(medias):
+        try:
+            doc = build_file_doc(media, sources[i] if sources else None)
+        except Exception as e:
+            logger.error(f"Bulk save prepare error: {e}")
+            doc = None
+        if doc:
+            docs.append(doc)
+        else:
+            bad += 1
+
+    counts = await save_docs_bulk(docs, fast)
+    counts["err"] += bad
+    return counts
+
+def _upsert_update(doc: Dict) -> Dict:
+    update = {
+        "$setOnInsert": {
+            k: v for k, v in doc.items()
+            if k not in UPSERT_FIELDS and k != "sources"
+        },
+        "$set": {k: doc[k] for k in UPSERT_FIELDS if k in doc}
+    }
+    if doc.get("sources"):
+        update["$addToSet"] = {"sources": {"$each": doc["sources"]}}
+    return update
+
+async def save_docs_bulk(docs: List[Dict], fast: Optional[bool] = None) -> Dict[str, int]:
+    """
+    Bulk upsert documents already built by build_file_doc
+    Returns: {'suc': new, 'dup': updated, 'err': failed}
+    """
+    counts = {"suc": 0, "dup": 0, "err": 0}
+
+    # The last copy wins if a file repeats in the batch (sources merge)
+    unique = {}
+    for doc in docs:
+        prev = unique.get(doc["_id"])
+        if prev:
+            counts["dup"] += 1
+            if prev.get("sources"):
+                doc = {**doc, "sources": prev["sources"] + doc.get("sources", [])}
+        unique[doc["_id"]] = doc
+
+    if not unique:
+        return counts
+
+    docs = list(unique.values())
+    ops = [
+        UpdateOne({"_id": doc["_id"]}, _upsert_update(doc), upsert=True)
+        for doc in docs
+    ]
+
+    fast = INDEX_FAST_INGEST if fast is None else fast
+    target = collection.with_options(write_concern=FAST_INGEST_CONCERN) if fast else collection
+
+    failed = set()
+    try:
+        res = await run_db(
+            "bulk_upsert",
+            target.bulk_write, ops,
+            ordered=False,
+            timeout=DB_WRITE_TIMEOUT
+        )
+        upserted = set(res.upserted_ids)
+    except BulkWriteError as e:
+        details = e.details or {}
+        upserted = {u["index"] for u in details.get("upserted", [])}
+        failed = {w["index"] for w in details.get("writeErrors", [])}
+        logger.warning(f"Bulk save: {len(failed)} write errors")
+    except Exception as e:
+        logger.error(f"Bulk save error: {e}")
+        counts["err"] += len(docs)
+        return counts
+
+    # ---- per item outcome + local state ----
+    written = []
+    for i, doc in enumerate(docs):
+        if i in failed:
+            counts["err"] += 1
+            continue
+        written.append(doc)
+        if i in upserted:
+            counts["suc"] += 1
+            SEARCH_INDEX.add(doc)
+        else:
+            counts["dup"] += 1
+            SEARCH_INDEX.update(
+                doc["_id"],
+                caption=doc["caption"],
+                quality=doc["quality"],
+                file_size=doc["file_size"]
+            )
+
+    remember_ids(doc["_id"] for doc in written)
+    invalidate_files(written)
+    return counts
+
 # =====================================================
 # 🔄 UPDATE CAPTION
 # =====================================================
@@ -356,19 +1442,37 @@ async def update_file_caption(file_id: str, new_caption: str) -> bool:
 
     try:
         cleaned_caption = clean_text(new_caption)
-        
-        res = collection.update_one(
+
+        # ngrams depend on the stored name as well as the caption
+        current = await run_db(
+            "find_one",
+            collection.find_one, {"_id": file_id}, {"file_name": 1}
+        )
+        if not current:
+            return False
+
+        res = await run_db(
+            "update_one",
+            collection.update_one,
             {"_id": file_id},
             {
                 "$set": {
                     "caption": cleaned_caption,
+                    "ngrams": doc_trigrams(
+                        current.get("file_name", ""),
+                        cleaned_caption,
+                        USE_CAPTION_FILTER
+                    ),
                     "updated_at": datetime.utcnow()
                 }
-            }
+            },
+            timeout=DB_WRITE_TIMEOUT
         )
-        
-        # Clear cache on update
-        cache_clear()
+
+        SEARCH_INDEX.update(file_id, caption=cleaned_caption)
+
+        # Drop cached searches holding this file or matching its new caption
+        invalidate_files([{"_id": file_id, "caption": cleaned_caption}])
         
         return res.modified_count > 0
     
@@ -387,15 +1491,21 @@ async def update_file_quality(file_id: str, new_name: str) -> bool:
     try:
         quality = detect_quality(new_name)
 
-        res = collection.update_one(
+        res = await run_db(
+            "update_one",
+            collection.update_one,
             {"_id": file_id},
             {
                 "$set": {
                     "quality": quality,
                     "updated_at": datetime.utcnow()
                 }
-            }
+            },
+            timeout=DB_WRITE_TIMEOUT
         )
+
+        SEARCH_INDEX.update(file_id, quality=quality)
+        invalidate_files([{"_id": file_id}])
         
         return res.modified_count > 0
     
@@ -456,11 +1566,16 @@ async def database_health_check() -> Dict[str, Any]:
             "status": "healthy",
             "total_files": db_count_documents(),
             "cache_size": len(SEARCH_CACHE),
+            "cache": search_cache_stats(),
+            "executor": db_executor_stats(),
+            "memory_index": SEARCH_INDEX.stats(),
+            "ngrams": dict(NGRAM_STATE),
+            "known_ids": KNOWN_IDS.stats() if KNOWN_IDS else None,
             "connected": True
         }
         
         # Test query
-        collection.find_one({})
+        await run_db("health", collection.find_one, {})
         
         return stats
     
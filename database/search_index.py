@@ -0,0 +1,261 @@
+import re
+import math
+import logging
+from array import array
+from bisect import bisect_left
+from heapq import nsmallest
+from typing import List, Tuple, Optional, Dict, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Fields kept per document so a page can be rendered without Mongo
+DOC_FIELDS = ("file_name", "file_size", "caption", "quality")
+
+# Queries whose rarest token matches more files than this are left to
+# Mongo: scoring runs on the event loop and must stay short
+MAX_CANDIDATES = 5000
+
+YEAR_TOKEN_RE = re.compile(r"^(19|20)\d\d$")
+
+
+# =====================================================
+# 🔤 TOKENIZER
+# =====================================================
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (min 2 chars, numbers of any length)"""
+    if not text:
+        return []
+    # single digits stay: "toy story 3" is not "toy story 4"
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) >= 2 or t.isdigit()]
+
+
+# =====================================================
+# 🧠 IN-MEMORY INVERTED INDEX
+# =====================================================
+class InvertedIndex:
+    """
+    token -> sorted array of internal doc numbers
+
+    File ids are mapped to dense ints so each posting list is a compact
+    array('I') instead of a set of strings. Deleted slots are left as
+    None and skipped while searching.
+    """
+
+    def __init__(self, use_caption: bool = True):
+        self.use_caption = use_caption
+        self.ready = False
+        self._ids: List[Optional[str]] = []          # num -> file _id
+        self._docs: List[Optional[Tuple]] = []       # num -> DOC_FIELDS values
+        self._names: List[Optional[frozenset]] = []  # num -> file name tokens
+        self._years: List[Optional[frozenset]] = []  # num -> year tokens
+        self._nums: Dict[str, int] = {}              # file _id -> num
+        self._postings: Dict[str, array] = {}        # token -> doc nums
+        self._tombstones: set = set()                # deleted while warming
+
+    def __len__(self) -> int:
+        return len(self._nums)
+
+    # -------------------------------------------------
+    # internal helpers
+    # -------------------------------------------------
+    def _doc_tokens(self, num: int) -> set:
+        tokens = set(self._names[num])
+        if self.use_caption:
+            tokens.update(tokenize(self._docs[num][2]))
+        return tokens
+
+    def _store(self, num: int, values: Tuple) -> None:
+        name_tokens = frozenset(tokenize(values[0]))
+        self._docs[num] = values
+        self._names[num] = name_tokens
+        # year filter looks at name and caption, whatever use_caption says
+        self._years[num] = frozenset(
+            t for t in name_tokens.union(tokenize(values[2]))
+            if YEAR_TOKEN_RE.match(t)
+        )
+
+    def _link(self, num: int, tokens: Iterable[str]) -> None:
+        for tok in tokens:
+            plist = self._postings.get(tok)
+            if plist is None:
+                self._postings[tok] = array("I", [num])
+            elif plist[-1] < num:
+                plist.append(num)
+            else:
+                i = bisect_left(plist, num)
+                if i == len(plist) or plist[i] != num:
+                    plist.insert(i, num)
+
+    def _unlink(self, num: int, tokens: Iterable[str]) -> None:
+        for tok in tokens:
+            plist = self._postings.get(tok)
+            if plist is None:
+                continue
+            i = bisect_left(plist, num)
+            if i < len(plist) and plist[i] == num:
+                del plist[i]
+            if not plist:
+                del self._postings[tok]
+
+    # -------------------------------------------------
+    # mutations
+    # -------------------------------------------------
+    def add(self, doc: Dict[str, Any], warm: bool = False) -> None:
+        """Insert or replace a document"""
+        file_id = doc.get("_id")
+        if not file_id:
+            return
+        if warm and (file_id in self._nums or file_id in self._tombstones):
+            # live writes during warm-up win over the startup scan
+            return
+        self._tombstones.discard(file_id)
+
+        values = tuple(doc.get(f) for f in DOC_FIELDS)
+        num = self._nums.get(file_id)
+        if num is not None:
+            self._unlink(num, self._doc_tokens(num))
+        else:
+            num = len(self._ids)
+            self._ids.append(file_id)
+            self._docs.append(None)
+            self._names.append(None)
+            self._years.append(None)
+            self._nums[file_id] = num
+
+        self._store(num, values)
+        self._link(num, self._doc_tokens(num))
+
+    def update(self, file_id: str, **fields) -> None:
+        """Patch stored fields of an existing document"""
+        num = self._nums.get(file_id)
+        if num is None:
+            return
+        doc = dict(zip(DOC_FIELDS, self._docs[num]))
+        doc.update({k: v for k, v in fields.items() if k in DOC_FIELDS})
+        doc["_id"] = file_id
+        self.add(doc)
+
+    def remove(self, file_id: str) -> None:
+        """Drop a document"""
+        if not self.ready:
+            self._tombstones.add(file_id)
+        num = self._nums.pop(file_id, None)
+        if num is None:
+            return
+        self._unlink(num, self._doc_tokens(num))
+        self._ids[num] = None
+        self._docs[num] = None
+        self._names[num] = None
+        self._years[num] = None
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self._tombstones.clear()
+
+    # -------------------------------------------------
+    # search
+    # -------------------------------------------------
+    def search(
+        self,
+        query: str,
+        offset: int = 0,
+        max_results: int = 10,
+        quality: Optional[str] = None,
+        year: Optional[str] = None
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """
+        AND-match all query tokens, rank by idf weighted hits
+        (file name hits count double). Optional quality / year
+        filters are applied to the candidates. Returns None on a miss,
+        or when even the rarest token has more than MAX_CANDIDATES files.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return None
+
+        plists = []
+        for tok in tokens:
+            plist = self._postings.get(tok)
+            if not plist:
+                return None
+            plists.append((tok, plist))
+
+        plists.sort(key=lambda x: len(x[1]))
+        if len(plists[0][1]) > MAX_CANDIDATES:
+            return None
+        candidates = set(plists[0][1])
+        for _, plist in plists[1:]:
+            candidates.intersection_update(plist)
+            if not candidates:
+                return None
+
+        n_docs = max(len(self._nums), 1)
+        idf = {tok: math.log(1 + n_docs / len(plist)) for tok, plist in plists}
+
+        docs, names, years = self._docs, self._names, self._years
+        base = sum(idf.values())
+        scored = []
+        for num in candidates:
+            values = docs[num]
+            if values is None:
+                continue
+            if quality and values[3] != quality:
+                continue
+            if year and year not in years[num]:
+                continue
+            name_tokens = names[num]
+            score = base + sum(idf[t] for t in tokens if t in name_tokens)
+            scored.append((-score, num))
+
+        if not scored:
+            return None
+
+        total = len(scored)
+        files = []
+        for _, num in nsmallest(offset + max_results, scored)[offset:]:
+            doc = dict(zip(DOC_FIELDS, self._docs[num]))
+            doc["_id"] = self._ids[num]
+            files.append(doc)
+
+        return files, total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "docs": len(self._nums),
+            "tokens": len(self._postings),
+            "postings": sum(len(p) for p in self._postings.values())
+        }
+
+
+# =====================================================
+# 🔡 TRIGRAMS
+# =====================================================
+NGRAM_SIZE = 3
+NGRAM_CAPTION_CHARS = 200   # captions can be long, only the head is indexed
+
+def normalize_for_ngrams(text: str) -> str:
+    """Lowercase, collapse whitespace (same shape as clean_text output)"""
+    return " ".join(TOKEN_RE.findall((text or "").lower()))
+
+def make_trigrams(text: str) -> List[str]:
+    """Distinct character trigrams of the normalized text"""
+    norm = normalize_for_ngrams(text)
+    if len(norm) < NGRAM_SIZE:
+        return []
+    return list(dict.fromkeys(
+        norm[i:i + NGRAM_SIZE] for i in range(len(norm) - NGRAM_SIZE + 1)
+    ))
+
+def doc_trigrams(file_name: str, caption: str = "", use_caption: bool = True) -> List[str]:
+    """Trigram set stored on a file document"""
+    grams = make_trigrams(file_name)
+    if use_caption and caption:
+        seen = set(grams)
+        grams.extend(
+            g for g in make_trigrams(caption[:NGRAM_CAPTION_CHARS])
+            if g not in seen
+        )
+    return grams
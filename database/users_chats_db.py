@@ -1,9 +1,12 @@
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, ReplaceOne, DeleteOne
+from pymongo.errors import OperationFailure
+from datetime import datetime, timezone
 import time
 import asyncio
 from functools import wraps
 
+from database.cache import LRUCache, SingleFlight
+
 from info import (
     BOT_ID,
     ADMINS,
@@ -76,6 +79,10 @@ class Database:
         "last_warn": 0,
     }
 
+    # per-user context (users + premium + bans) cache
+    USER_CTX_SIZE = 20000
+    USER_CTX_TTL = 300
+
     # =========================
     # INIT
     # =========================
@@ -89,6 +96,13 @@ class Database:
         self.reminders = dbase.reminders
         self.bans = dbase.bans
         self.warns = dbase.warns
+        self.deferred = dbase.deferred
+        self.queries = dbase.search_queries
+
+        self.user_ctx = LRUCache("user_ctx", max_items=self.USER_CTX_SIZE, ttl=self.USER_CTX_TTL)
+        self.user_flight = SingleFlight("user_ctx")
+        self._documents_ok = True   # $documents needs MongoDB 5.1+
+        self._ctx_writes = 0         # bumped by every invalidation
 
         self._create_indexes()
 
@@ -100,10 +114,80 @@ class Database:
             self.bans.create_index("until")
             self.warns.create_index([("user_id", 1), ("chat_id", 1)])
             self.premium.create_index("id", unique=True)
+            self.premium.create_index([("plan.premium", 1), ("plan.expire", 1)])
             self.reminders.create_index([("sent", 1), ("remind_at", 1)])
+            self.deferred.create_index("due")
+            self.queries.create_index("created_at", expireAfterSeconds=86400)
         except:
             pass
 
+    # =========================
+    # 👤 USER CONTEXT (ONE FETCH)
+    # =========================
+    def _fetch_contexts(self, user_ids: list) -> dict:
+        """users + premium + bans for many users in one round trip"""
+        docs = None
+        if self._documents_ok:
+            try:
+                docs = list(dbase.aggregate([
+                    {"$documents": [{"id": uid} for uid in user_ids]},
+                    {"$lookup": {"from": self.users.name, "localField": "id", "foreignField": "id", "as": "user"}},
+                    {"$lookup": {"from": self.premium.name, "localField": "id", "foreignField": "id", "as": "premium"}},
+                    {"$lookup": {"from": self.bans.name, "localField": "id", "foreignField": "id", "as": "ban"}},
+                ]))
+            except OperationFailure:
+                # older server: fall back to one find per collection
+                self._documents_ok = False
+
+        if docs is None:
+            flt = {"id": {"$in": user_ids}}
+            users = {d["id"]: d for d in self.users.find(flt)}
+            premium = {d["id"]: d for d in self.premium.find(flt)}
+            bans = {d["id"]: d for d in self.bans.find(flt)}
+            docs = [
+                {
+                    "id": uid,
+                    "user": [users[uid]] if uid in users else [],
+                    "premium": [premium[uid]] if uid in premium else [],
+                    "ban": [bans[uid]] if uid in bans else [],
+                }
+                for uid in user_ids
+            ]
+
+        contexts = {}
+        for d in docs:
+            user = d["user"][0] if d["user"] else None
+            premium = d["premium"][0] if d["premium"] else None
+            contexts[d["id"]] = {
+                "user": user,
+                "plan": (premium or {}).get("plan") or self.default_plan.copy(),
+                "ban": d["ban"][0] if d["ban"] else None,
+                "verify": (user or {}).get("verify") or self.default_verify.copy(),
+                "lang": (user or {}).get("lang", "auto"),
+            }
+        return contexts
+
+    async def get_user_context(self, user_id: int) -> dict:
+        """Read-through cached context shared by every handler"""
+        ctx = self.user_ctx.get(user_id)
+        if ctx is not None:
+            return ctx
+        return await self.user_flight.do(user_id, self._load_context, user_id)
+
+    async def _load_context(self, user_id: int) -> dict:
+        writes = self._ctx_writes
+        contexts = await asyncio.to_thread(self._fetch_contexts, [user_id])
+        ctx = contexts[user_id]
+        # a write landed while loading: the result may predate it
+        if writes == self._ctx_writes:
+            self.user_ctx.set(user_id, ctx)
+        return ctx
+
+    def invalidate_user(self, user_id: int):
+        """Drop a cached context after any write that changes it"""
+        self._ctx_writes += 1
+        self.user_ctx.pop(user_id, None)
+
     # =========================
     # USERS
     # =========================
@@ -125,6 +209,35 @@ class Database:
                 "verify": self.default_verify.copy()
             }
         )
+        self.invalidate_user(user_id)
+        return True
+
+    async def get_user(self, user_id: int):
+        ctx = await self.get_user_context(user_id)
+        return ctx["user"]
+
+    async def update_user(self, user_id: int, data: dict):
+        await asyncio.to_thread(
+            self.users.update_one,
+            {"id": user_id},
+            {"$set": data},
+            upsert=True
+        )
+        self.invalidate_user(user_id)
+        return True
+
+    async def get_verify_status(self, user_id: int):
+        ctx = await self.get_user_context(user_id)
+        return dict(ctx["verify"])
+
+    async def update_verify_status(self, user_id: int, verify: dict):
+        await asyncio.to_thread(
+            self.users.update_one,
+            {"id": user_id},
+            {"$set": {"verify": verify}},
+            upsert=True
+        )
+        self.invalidate_user(user_id)
         return True
 
     async def total_users_count(self):
@@ -152,14 +265,16 @@ class Database:
             }},
             upsert=True
         )
+        self.invalidate_user(user_id)
         return True
 
     async def unban_user(self, user_id: int):
         await asyncio.to_thread(self.bans.delete_one, {"id": user_id})
+        self.invalidate_user(user_id)
         return True
 
     async def get_ban_status(self, user_id: int):
-        ban = await asyncio.to_thread(self.bans.find_one, {"id": user_id})
+        ban = (await self.get_user_context(user_id))["ban"]
         if not ban:
             return {"status": False}
 
@@ -212,15 +327,8 @@ class Database:
     # 💎 PREMIUM (🔥 FIXED)
     # =========================
     async def get_plan(self, user_id: int):
-        data = await asyncio.to_thread(
-            self.premium.find_one,
-            {"id": user_id}
-        )
-
-        if not data:
-            return self.default_plan.copy()
-
-        return data.get("plan", self.default_plan.copy())
+        ctx = await self.get_user_context(user_id)
+        return dict(ctx["plan"])
 
     async def update_plan(self, user_id: int, plan_data: dict):
         await asyncio.to_thread(
@@ -229,6 +337,7 @@ class Database:
             {"$set": {"plan": plan_data}},
             upsert=True
         )
+        self.invalidate_user(user_id)
         return True
 
     async def get_premium_users(self):
@@ -236,6 +345,85 @@ class Database:
             lambda: list(self.premium.find({"plan.premium": True}))
         )
 
+    @staticmethod
+    def _expire_before(before: datetime) -> dict:
+        """plan.expire <= before, for both BSON dates and legacy unix timestamps"""
+        ts = before.replace(tzinfo=timezone.utc).timestamp()
+        return {
+            "plan.premium": True,
+            "$or": [
+                {"plan.expire": {"$lte": before}},
+                {"plan.expire": {"$lte": ts}}
+            ]
+        }
+
+    async def get_expiring(self, before: datetime):
+        """Premium users whose plan expires by `before` (plan.expire index)"""
+        return await asyncio.to_thread(
+            lambda: list(self.premium.find(
+                self._expire_before(before),
+                {"_id": 0, "id": 1, "plan.expire": 1, "plan.last_reminder": 1}
+            ))
+        )
+
+    async def expire_plans(self, user_ids: list, before: datetime):
+        """Downgrade many plans at once; renewed plans no longer match"""
+        if not user_ids:
+            return 0
+        res = await asyncio.to_thread(
+            self.premium.update_many,
+            {"id": {"$in": user_ids}, **self._expire_before(before)},
+            {"$set": {
+                "plan.premium": False,
+                "plan.expire": "",
+                "plan.plan": "",
+                "plan.last_reminder": "expired"
+            }}
+        )
+        for user_id in user_ids:
+            self.invalidate_user(user_id)
+        return res.modified_count
+
+    async def set_last_reminder(self, user_id: int, tag: str):
+        await asyncio.to_thread(
+            self.premium.update_one,
+            {"id": user_id},
+            {"$set": {"plan.last_reminder": tag}}
+        )
+        self.invalidate_user(user_id)
+        return True
+
+    # =========================
+    # ⏲ DEFERRED ACTIONS
+    # =========================
+    async def get_deferred(self):
+        return await asyncio.to_thread(lambda: list(self.deferred.find({})))
+
+    async def save_deferred(self, upserts: list, removed: list):
+        """Persist scheduler changes: upserts are {_id, due, action, args}"""
+        ops = [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in upserts]
+        ops += [DeleteOne({"_id": key}) for key in removed]
+        if ops:
+            await asyncio.to_thread(self.deferred.bulk_write, ops, ordered=False)
+        return len(ops)
+
+    # =========================
+    # 🔎 SEARCH QUERY IDS (STATELESS BUTTONS)
+    # =========================
+    async def save_query(self, query_id: str, text: str):
+        await asyncio.to_thread(
+            self.queries.update_one,
+            {"_id": query_id},
+            # every reuse refreshes created_at, so the TTL restarts
+            {"$setOnInsert": {"text": text}, "$set": {"created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        return True
+
+    async def get_query(self, query_id: str):
+        doc = await asyncio.to_thread(self.queries.find_one, {"_id": query_id})
+        return doc["text"] if doc else None
+
 
 # =========================
 # EXPORT
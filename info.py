@@ -104,6 +104,25 @@ COLLECTION_NAME = environ.get('COLLECTION_NAME', 'files')
 FILES_COLLECTION = environ.get('FILES_COLLECTION', 'files_hot')
 FILES_BACKUP_COLLECTION = environ.get('FILES_BACKUP_COLLECTION', 'files_cold')
 
+# 🔥 FILES DB EXECUTOR (blocking pymongo runs off the event loop)
+DB_MAX_WORKERS = int(environ.get('DB_MAX_WORKERS', 16))
+DB_SEARCH_TIMEOUT = float(environ.get('DB_SEARCH_TIMEOUT', 8))
+DB_WRITE_TIMEOUT = float(environ.get('DB_WRITE_TIMEOUT', 15))
+# Bloom filter of known file ids (rebuilt from the DB if missing)
+KNOWN_IDS_PATH = environ.get('KNOWN_IDS_PATH', 'known_ids.bloom')
+# fast ingest: bulk index writes skip the journal wait (initial backfills)
+INDEX_FAST_INGEST = is_enabled('INDEX_FAST_INGEST', False)
+# channel index jobs allowed to run at the same time (rest are queued)
+INDEX_CONCURRENCY = int(environ.get('INDEX_CONCURRENCY', 3))
+# hours between forward catch-up scans of INDEX_CHANNELS (0 = off)
+INDEX_CATCHUP_INTERVAL = float(environ.get('INDEX_CATCHUP_INTERVAL', 24))
+# hours between sweeps that purge files of deleted channel posts (0 = off)
+PURGE_SWEEP_INTERVAL = float(environ.get('PURGE_SWEEP_INTERVAL', 24))
+# results buttons carry signed (query-id, offset, owner) instead of a
+# server-side key: pagination survives restarts and works across instances
+CALLBACK_STATELESS = is_enabled('CALLBACK_STATELESS', False)
+CALLBACK_SECRET = environ.get('CALLBACK_SECRET', '') or BOT_TOKEN
+
 USERS_COLLECTION = environ.get('USERS_COLLECTION', 'users')
 CHATS_COLLECTION = environ.get('CHATS_COLLECTION', 'chats')
 BANS_COLLECTION = environ.get('BANS_COLLECTION', 'bans')
@@ -146,6 +165,8 @@ AUTO_DELETE = is_enabled('AUTO_DELETE', False)
 WELCOME = is_enabled('WELCOME', True)
 PROTECT_CONTENT = is_enabled('PROTECT_CONTENT', False)
 LINK_MODE = is_enabled("LINK_MODE", True)
+USE_MEMORY_INDEX = is_enabled('USE_MEMORY_INDEX', False)
+SEARCH_PREFETCH = is_enabled('SEARCH_PREFETCH', True)
 
 # ================= STREAM =================
 
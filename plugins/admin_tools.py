@@ -11,8 +11,9 @@ from hydrogram.errors import MessageNotModified, MessageIdInvalid, BadRequest
 
 from info import ADMINS, LOG_CHANNEL
 from database.users_chats_db import db
-from database.ia_filterdb import db_count_documents, delete_files
+from database.ia_filterdb import db_count_documents, delete_files, search_cache_stats
 from utils import get_size, get_readable_time, temp
+from scheduler import deferred_stats
 
 
 # ======================================================
@@ -135,6 +136,36 @@ async def build_dashboard():
             dur = max(1, time.time() - idx.get("start", time.time()))
             speed = idx.get("saved", 0) / dur
             idx_text = f"🚀 {speed:.2f} files/sec"
+            if idx.get("jobs"):
+                idx_text += f" · {idx['jobs']} jobs"
+                if idx.get("queued"):
+                    idx_text += f" (+{idx['queued']} queued)"
+            stages = idx.get("stages")
+            if stages:
+                idx_text += " (" + " | ".join(f"{k} {v:.0f}/s" for k, v in stages.items()) + ")"
+    except:
+        pass
+
+    # Search cache
+    cache_text = "N/A"
+    try:
+        sc = search_cache_stats()["search"]
+        cache_text = (
+            f"{sc['hit_rate']}% hit | {sc['items']} items | "
+            f"{get_size(sc['bytes'])} | {sc['evictions']} evicted"
+        )
+    except:
+        pass
+
+    # Deferred actions + batched deletes
+    defer_text = "N/A"
+    try:
+        ds = deferred_stats()
+        dl = ds["deletes"]
+        defer_text = (
+            f"{ds['pending']} pending | 🗑 {dl['deleted']} deleted in "
+            f"{dl['calls']} calls | {dl['retries']} retried | {dl['failed']} failed"
+        )
     except:
         pass
 
@@ -145,6 +176,8 @@ async def build_dashboard():
         f"📦 <b>Indexed Files</b>: <code>{stats['files']}</code>\n"
         f"💎 <b>Premium Users</b>: <code>{stats['premium']}</code>\n\n"
         f"⚡ <b>Index Speed</b>  : <code>{idx_text}</code>\n"
+        f"🧠 <b>Search Cache</b> : <code>{cache_text}</code>\n"
+        f"⏲ <b>Deferred</b>     : <code>{defer_text}</code>\n"
         f"🗃 <b>DB Size</b>      : <code>{stats['used_data']}</code>\n\n"
         f"⏱ <b>Uptime</b>       : <code>{stats['uptime']}</code>\n"
         f"🔄 <b>Updated</b>      : <code>{stats['now']}</code>"
@@ -225,5 +258,5 @@ async def delete_cmd(_, message):
         return await message.reply("Usage: /delete keyword")
 
     key = message.text.split(" ", 1)[1].strip()
-    count = await asyncio.to_thread(delete_files, key)
+    count = await delete_files(key)
     await message.reply(f"✅ Deleted {count} files for `{key}`")
@@ -30,6 +30,7 @@ from info import (
 from utils import is_premium, get_wish, temp
 from database.users_chats_db import db
 from database.ia_filterdb import db_count_documents
+from scheduler import SCHEDULER
 
 
 # ======================================================
@@ -154,6 +155,9 @@ async def cb_handler(client: Client, query: CallbackQuery):
         if data == "close_data":
             await safe_answer_query(query, "Closed")
 
+            # closed by hand: drop its pending auto-delete
+            SCHEDULER.cancel(f"file:{uid}:{query.message.id}")
+
             # Find and cleanup user's file entry
             target_key = None
             for k, v in temp.FILES.items():
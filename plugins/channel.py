@@ -7,18 +7,23 @@ from hydrogram.errors import (
     ChatWriteForbidden
 )
 
-from info import INDEX_CHANNELS, LOG_CHANNEL
+from info import INDEX_CHANNELS, LOG_CHANNEL, PURGE_SWEEP_INTERVAL
 from database.ia_filterdb import (
-    save_file,
+    save_files_bulk,
     update_file_caption,
-    detect_quality
+    detect_quality,
+    unpack_new_file_id,
+    delete_by_source,
+    get_source_ids,
+    get_max_source_id
 )
 
-# 🔥 Import manual index cancel flag
+# 🔥 Import manual index cancel flag + catch-up head tracking
 try:
-    from plugins.index import CANCEL_INDEX
+    from plugins.index import CANCEL_INDEX, set_live_head
 except:
     CANCEL_INDEX = {}
+    set_live_head = None
 
 # ─────────────────────────────────────────────
 # MEDIA FILTER
@@ -83,6 +88,92 @@ def format_file_size(size_bytes: int) -> str:
     except:
         return "Unknown"
 
+# ─────────────────────────────────────────────
+# 🧺 WRITE-BEHIND BUFFER (LIVE POSTS)
+# ─────────────────────────────────────────────
+# A season upload arrives as dozens of posts within seconds. Posts are
+# collected per channel for LIVE_FLUSH_DELAY and written with one bulk
+# upsert, one reaction and one log message per flush instead of a
+# write, a reaction and a log message per file.
+LIVE_FLUSH_DELAY = 3     # seconds a channel burst is collected
+LIVE_MAX_BATCH = 100     # flush early once this many files are waiting
+LOG_MAX_FILES = 15       # file names listed in one log message
+
+class LiveIndexBuffer:
+    def __init__(self):
+        self.pending = {}   # chat_id -> [(message, media)]
+        self.timers = {}    # chat_id -> delayed flush task
+
+    def add(self, bot, message, media):
+        chat_id = message.chat.id
+        items = self.pending.setdefault(chat_id, [])
+        items.append((message, media))
+
+        if len(items) >= LIVE_MAX_BATCH:
+            timer = self.timers.pop(chat_id, None)
+            if timer:
+                timer.cancel()
+            asyncio.create_task(self.flush(bot, chat_id))
+        elif chat_id not in self.timers:
+            self.timers[chat_id] = asyncio.create_task(self._flush_later(bot, chat_id))
+
+    async def _flush_later(self, bot, chat_id):
+        await asyncio.sleep(LIVE_FLUSH_DELAY)
+        self.timers.pop(chat_id, None)
+        await self.flush(bot, chat_id)
+
+    async def flush(self, bot, chat_id):
+        items = self.pending.pop(chat_id, None)
+        if not items:
+            return
+
+        medias = [media for _, media in items]
+        sources = [(message.chat.id, message.id) for message, _ in items]
+        try:
+            counts = await save_files_bulk(medias, sources=sources)
+        except Exception:
+            counts = {"suc": 0, "dup": 0, "err": len(medias)}
+
+        # newest live post: catch-up scans at least up to here
+        if set_live_head:
+            try:
+                await asyncio.to_thread(set_live_head, chat_id, max(mid for _, mid in sources))
+            except Exception as e:
+                print(f"Live head update error ({chat_id}): {e}")
+
+        last = items[-1][0]
+        await safe_react(last, "❌" if counts["err"] else ("✅" if counts["suc"] else "♻️"))
+
+        lines = [
+            f"• `{media.file_name}` | `{format_file_size(getattr(media, 'file_size', 0))}`"
+            f" | `{detect_quality(media.file_name)}`"
+            for media in medias[:LOG_MAX_FILES]
+        ]
+        if len(medias) > LOG_MAX_FILES:
+            lines.append(f"… and `{len(medias) - LOG_MAX_FILES}` more")
+
+        await safe_log(
+            bot,
+            f"📥 **Auto Index** ({len(medias)} files)\n\n"
+            + "\n".join(lines) + "\n\n"
+            f"✅ `{counts['suc']}` | ♻️ `{counts['dup']}` | ❌ `{counts['err']}`\n"
+            f"💬 `{last.chat.title}`"
+        )
+
+    async def flush_all(self, bot):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        for chat_id in list(self.pending):
+            await self.flush(bot, chat_id)
+
+
+LIVE_BUFFER = LiveIndexBuffer()
+
+async def flush_live_index(bot):
+    """Write whatever is still buffered (bot shutdown)"""
+    await LIVE_BUFFER.flush_all(bot)
+
 # ─────────────────────────────────────────────
 # 📥 AUTO INDEX (LIVE POSTS ONLY)
 # ─────────────────────────────────────────────
@@ -97,36 +188,8 @@ async def index_new_file(bot, message):
     if not media:
         return
 
-    try:
-        caption = message.caption or ""
-        quality = detect_quality(media.file_name, caption)
-        file_size = getattr(media, "file_size", 0)
-
-        status = await save_file(media, quality=quality)
-
-        emoji_map = {
-            "suc": "✅",
-            "dup": "♻️",
-            "err": "❌",
-            "skip": "⏭",
-        }
-
-        await safe_react(message, emoji_map.get(status, "❓"))
-
-        await safe_log(
-            bot,
-            f"📥 **Auto Index**\n\n"
-            f"📄 `{media.file_name}`\n"
-            f"📊 `{format_file_size(file_size)}`\n"
-            f"🎞 `{quality}`\n"
-            f"✅ `{status}`\n"
-            f"💬 `{message.chat.title}`"
-        )
-
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-    except Exception:
-        await safe_react(message, "❌")
+    media.caption = message.caption or ""
+    LIVE_BUFFER.add(bot, message, media)
 
 # ─────────────────────────────────────────────
 # ✏️ CAPTION EDIT
@@ -140,12 +203,12 @@ async def update_caption(bot, message):
 
     try:
         new_caption = message.caption or ""
-        quality = detect_quality(media.file_name, new_caption)
 
+        # files are keyed by the unpacked id; only this file's cached
+        # searches are invalidated by the update
         updated = await update_file_caption(
-            media.file_id,
-            new_caption,
-            quality
+            unpack_new_file_id(media.file_id),
+            new_caption
         )
 
         await safe_react(message, "✏️" if updated else "⚠️")
@@ -158,15 +221,105 @@ async def update_caption(bot, message):
         await safe_react(message, "❌")
 
 # ─────────────────────────────────────────────
-# 🗑️ DELETE LOG
+# 🗑️ PURGE DELETED POSTS
 # ─────────────────────────────────────────────
+# Deletions arrive in bursts (an admin clearing a season); ids are
+# collected per channel and purged with one query per flush. Files
+# removed while the bot was offline are caught by the periodic sweep.
+PURGE_FLUSH_DELAY = 5    # seconds deletions are collected
+SWEEP_BATCH = 200        # id window per sweep call (get_messages max)
+SWEEP_PAUSE = 2          # seconds between sweep calls (flood safety)
 
-@Client.on_deleted_messages(filters.chat(INDEX_CHANNELS), group=12)
-async def handle_deleted_files(bot, messages):
-    try:
+class DeletePurger:
+    def __init__(self):
+        self.pending = {}   # chat_id -> set(msg_id)
+        self.timers = {}
+
+    def add(self, bot, chat_id, msg_ids):
+        self.pending.setdefault(chat_id, set()).update(msg_ids)
+        if chat_id not in self.timers:
+            self.timers[chat_id] = asyncio.create_task(self._flush_later(bot, chat_id))
+
+    async def _flush_later(self, bot, chat_id):
+        await asyncio.sleep(PURGE_FLUSH_DELAY)
+        self.timers.pop(chat_id, None)
+        ids = self.pending.pop(chat_id, set())
+        if not ids:
+            return
+
+        removed = await delete_by_source(chat_id, sorted(ids))
         await safe_log(
             bot,
-            f"🗑️ **Deleted Messages**\nCount: `{len(messages)}`"
+            f"🗑️ **Deleted Messages**\n"
+            f"Count: `{len(ids)}` | Files purged: `{removed}`\n"
+            f"💬 `{chat_id}`"
         )
+
+
+PURGER = DeletePurger()
+
+
+async def sweep_channel(bot, chat_id):
+    """Purge stored files whose source post no longer exists"""
+    head = await get_max_source_id(chat_id) or 0
+    after = 0
+    purged = 0
+    while after < head:
+        upto = after + SWEEP_BATCH
+        msg_ids = await get_source_ids(chat_id, after, upto)
+        if not msg_ids:
+            after = upto
+            continue
+
+        try:
+            msgs = await bot.get_messages(chat_id, msg_ids)
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
+            continue   # retry this window
+        after = upto
+
+        if not isinstance(msgs, list):
+            msgs = [msgs]
+        gone = [
+            mid for mid, msg in zip(msg_ids, msgs)
+            if not msg or getattr(msg, "empty", False) or not msg.media
+        ]
+        purged += await delete_by_source(chat_id, gone)
+        await asyncio.sleep(SWEEP_PAUSE)
+
+    return purged
+
+
+async def purge_sweep_worker(bot):
+    """Periodic reconcile of INDEX_CHANNELS against the files collection"""
+    if not PURGE_SWEEP_INTERVAL or not INDEX_CHANNELS:
+        return
+
+    while True:
+        await asyncio.sleep(PURGE_SWEEP_INTERVAL * 3600)
+        for channel in INDEX_CHANNELS:
+            try:
+                chat = await bot.get_chat(channel)
+                purged = await sweep_channel(bot, chat.id)
+                if purged:
+                    await safe_log(
+                        bot,
+                        f"🧽 **Purge Sweep**\n"
+                        f"💬 `{chat.title}`\n"
+                        f"Files purged: `{purged}`"
+                    )
+            except Exception as e:
+                print(f"Purge sweep error ({channel}): {e}")
+
+
+@Client.on_deleted_messages(filters.chat(INDEX_CHANNELS), group=12)
+async def handle_deleted_files(bot, messages):
+    try:
+        by_chat = {}
+        for msg in messages:
+            if msg.chat:
+                by_chat.setdefault(msg.chat.id, []).append(msg.id)
+        for chat_id, msg_ids in by_chat.items():
+            PURGER.add(bot, chat_id, msg_ids)
     except:
         pass
@@ -10,6 +10,7 @@ from info import IS_STREAM, PM_FILE_DELETE_TIME, PROTECT_CONTENT, ADMINS
 from database.ia_filterdb import get_file_details
 from database.users_chats_db import db
 from utils import get_settings, get_size, get_shortlink, temp, is_premium
+from scheduler import SCHEDULER, schedule_delete, delete_later
 
 
 # ======================================================
@@ -18,7 +19,7 @@ from utils import get_settings, get_size, get_shortlink, temp, is_premium
 GRACE_PERIOD = timedelta(minutes=30)
 RESEND_EXPIRE_TIME = 60  # seconds
 
-# Track active deletion tasks
+# Track active delivery tasks
 active_tasks = {}
 
 
@@ -30,7 +31,7 @@ async def has_premium_or_grace(user_id: int) -> bool:
     if user_id in ADMINS:
         return True
 
-    plan = db.get_plan(user_id)
+    plan = await db.get_plan(user_id)
     if not plan or not plan.get("premium"):
         return False
 
@@ -175,7 +176,7 @@ async def start_file_delivery(client: Client, message):
 # ======================================================
 # SCHEDULE FILE DELETION
 # ======================================================
-async def schedule_file_deletion(client, sent_msg, uid, file_id):
+def schedule_file_deletion(sent_msg, uid, file_id):
     """Schedule auto-deletion of file message"""
     msg_id = sent_msg.id
     
@@ -185,45 +186,39 @@ async def schedule_file_deletion(client, sent_msg, uid, file_id):
         "file_id": file_id,
         "expire": int(time.time()) + PM_FILE_DELETE_TIME
     }
-    
-    try:
-        # Wait for expiry
-        await asyncio.sleep(PM_FILE_DELETE_TIME)
-        
-        # Remove from tracking
-        data = temp.FILES.pop(msg_id, None)
-        if not data:
-            return
-        
-        # Delete the file message
-        try:
-            await sent_msg.delete()
-        except:
-            pass
-        
-        # Send resend button
-        resend = await client.send_message(
-            uid,
-            "⌛ <b>File expired</b>",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton(
-                    "🔁 Resend File",
-                    callback_data=f"resend#{file_id}"
-                )]
-            ])
-        )
-        
-        # Auto-delete resend button
-        await asyncio.sleep(RESEND_EXPIRE_TIME)
-        try:
-            await resend.delete()
-        except:
-            pass
-            
-    except asyncio.CancelledError:
-        # Task cancelled, cleanup
-        temp.FILES.pop(msg_id, None)
-        raise
+
+    SCHEDULER.schedule(
+        f"file:{uid}:{msg_id}",
+        PM_FILE_DELETE_TIME,
+        "expire_file",
+        chat_id=uid,
+        msg_id=msg_id,
+        file_id=file_id
+    )
+
+
+@SCHEDULER.action("expire_file")
+async def expire_file(client, chat_id, msg_id, file_id):
+    """Delete an expired file message and offer a resend"""
+    temp.FILES.pop(msg_id, None)
+
+    # Delete the file message (batched with other due deletes)
+    delete_later(client, chat_id, msg_id)
+
+    # Send resend button
+    resend = await client.send_message(
+        chat_id,
+        "⌛ <b>File expired</b>",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton(
+                "🔁 Resend File",
+                callback_data=f"resend#{file_id}"
+            )]
+        ])
+    )
+
+    # Auto-delete resend button
+    schedule_delete(chat_id, resend.id, RESEND_EXPIRE_TIME)
 
 
 # ======================================================
@@ -283,19 +278,7 @@ async def deliver_file(client, uid, grp_id, file_id):
         )
 
         # Schedule deletion
-        deletion_task = asyncio.create_task(
-            schedule_file_deletion(client, sent, uid, file_id)
-        )
-        
-        # Track deletion task
-        task_key = f"delete_{sent.id}"
-        active_tasks[task_key] = deletion_task
-        
-        # Cleanup callback
-        def cleanup_deletion(t):
-            active_tasks.pop(task_key, None)
-        
-        deletion_task.add_done_callback(cleanup_deletion)
+        schedule_file_deletion(sent, uid, file_id)
         
     except Exception:
         pass
@@ -1,5 +1,9 @@
+import hmac
+import base64
+import struct
 import asyncio
 import hashlib
+import secrets
 from math import ceil
 from time import time
 from collections import defaultdict
@@ -7,9 +11,17 @@ from collections import defaultdict
 from hydrogram import Client, filters, enums
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from info import ADMINS, UPI_ID, UPI_NAME
+from info import ADMINS, UPI_ID, UPI_NAME, CALLBACK_STATELESS, CALLBACK_SECRET
 from database.users_chats_db import db
-from database.ia_filterdb import get_search_results
+from database.cache import LRUCache
+from database.ia_filterdb import (
+    get_search_results,
+    prefetch_search,
+    normalize_query,
+    SORT_RELEVANCE,
+    SORT_NEWEST,
+    SORT_LARGEST
+)
 from utils import (
     get_size,
     is_premium,
@@ -17,6 +29,7 @@ from utils import (
     learn_keywords,
     suggest_query
 )
+from scheduler import SCHEDULER, schedule_delete
 
 # Configuration
 RESULTS_PER_PAGE_PM = 12      # PM में 12 results
@@ -26,16 +39,30 @@ EXPIRE_DELETE_DELAY = 60      # delete after 1 min
 RATE_LIMIT = 5                # searches per minute
 RATE_LIMIT_WINDOW = 60        # seconds
 
+# Sort buttons shown under results
+SORT_BUTTONS = (
+    (SORT_RELEVANCE, "⭐ Best"),
+    (SORT_NEWEST, "🆕 Newest"),
+    (SORT_LARGEST, "📦 Largest"),
+)
+
 # Rate limiting storage
 user_search_times = defaultdict(list)
 
 # Callback data storage (to avoid 64-byte limit)
-if not hasattr(temp, 'callback_data'):
-    temp.callback_data = {}
-
-# Track message activity for auto-expire
-if not hasattr(temp, 'message_activity'):
-    temp.message_activity = {}
+CALLBACK_TTL = 600                      # seconds a results button stays valid
+CALLBACK_MAX_KEYS = 50000
+CALLBACK_MAX_BYTES = 32 * 1024 * 1024   # cursors lists make entries uneven
+
+# O(1) insert / lookup; kept in insertion (= expiry) order, so expired
+# keys leave from the head on every insert and over-cap keys after them
+temp.callback_data = LRUCache(
+    "callback",
+    max_items=CALLBACK_MAX_KEYS,
+    ttl=CALLBACK_TTL,
+    max_bytes=CALLBACK_MAX_BYTES,
+    touch=False
+)
 
 
 # =====================================================
@@ -57,14 +84,97 @@ def is_rate_limited(user_id):
     return False
 
 
+# =====================================================
+# 🔏 STATELESS CALLBACK TOKENS
+# =====================================================
+# (query-id, offset, owner, sort, pm, issued) packed and HMAC-signed into
+# callback_data itself: 37 bytes -> 50 base64 chars, 55 with "page#".
+# The query text is stored once per distinct search under its id.
+# Stateless pages use skip/limit instead of keyset cursors (a cursor
+# list does not fit in 64 bytes).
+_TOKEN = struct.Struct("<8sIqBI")   # qid, offset, owner, flags, issued
+_MAC_LEN = 12
+_PM_FLAG = 0x80
+_SIGN_KEY = hashlib.sha256(f"callback:{CALLBACK_SECRET}".encode()).digest()
+SORT_CODES = (SORT_RELEVANCE, SORT_NEWEST, SORT_LARGEST)
+
+QUERY_IDS = LRUCache("query_ids", max_items=20000, ttl=CALLBACK_TTL * 6)
+
+
+def _sign(body):
+    return hmac.new(_SIGN_KEY, body, hashlib.sha256).digest()[:_MAC_LEN]
+
+
+async def _remember_query(qid, search):
+    try:
+        await db.save_query(qid.hex(), search)
+    except Exception as e:
+        print(f"Query id save error: {e}")
+
+
+def pack_callback(search, offset, owner, is_pm, sort):
+    qid = hashlib.blake2b(search.encode(), digest_size=8).digest()
+    if not QUERY_IDS.peek(qid):
+        QUERY_IDS[qid] = search
+        asyncio.create_task(_remember_query(qid, search))
+
+    flags = SORT_CODES.index(sort) if sort in SORT_CODES else 0
+    if is_pm:
+        flags |= _PM_FLAG
+    body = _TOKEN.pack(qid, offset, owner, flags, int(time()))
+    return base64.urlsafe_b64encode(body + _sign(body)).decode().rstrip("=")
+
+
+async def unpack_callback(token, chat_id):
+    """Verify a stateless token; None if forged, malformed or expired"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except ValueError:
+        return None
+
+    body, mac = raw[:-_MAC_LEN], raw[-_MAC_LEN:]
+    if len(body) != _TOKEN.size or not hmac.compare_digest(mac, _sign(body)):
+        return None
+
+    qid, offset, owner, flags, issued = _TOKEN.unpack(body)
+    if time() - issued > CALLBACK_TTL:
+        return None
+
+    search = QUERY_IDS.get(qid)
+    if search is None:
+        search = await db.get_query(qid.hex())
+        if search is None:
+            return None
+        QUERY_IDS[qid] = search
+
+    is_pm = bool(flags & _PM_FLAG)
+    sort = flags & ~_PM_FLAG
+    return {
+        'search': search,
+        'offset': offset,
+        'source_chat_id': 0 if is_pm else chat_id,
+        'owner': owner,
+        'is_pm': is_pm,
+        'sort': SORT_CODES[sort] if sort < len(SORT_CODES) else SORT_RELEVANCE,
+        'cursors': None
+    }
+
+
 # =====================================================
 # 🔑 CALLBACK KEY GENERATOR
 # =====================================================
-def make_callback_key(search, offset, source_chat_id, owner, is_pm):
-    """Generate short callback key and store full data"""
-    # Create unique hash
-    data_str = f"{search}:{offset}:{source_chat_id}:{owner}:{time()}"
-    key = hashlib.md5(data_str.encode()).hexdigest()[:12]
+def make_callback_key(search, offset, source_chat_id, owner, is_pm,
+                      sort=SORT_RELEVANCE, cursors=None):
+    """Generate short callback key and store full data
+
+    cursors holds the keyset cursor of every page up to and including
+    the target one, so Prev can resume without skip/limit.
+    """
+    if CALLBACK_STATELESS:
+        return pack_callback(search, offset, owner, is_pm, sort)
+
+    # Random key: buttons built in the same clock tick must not collide
+    key = secrets.token_hex(6)
     
     # Store full data
     temp.callback_data[key] = {
@@ -73,14 +183,8 @@ def make_callback_key(search, offset, source_chat_id, owner, is_pm):
         'source_chat_id': source_chat_id,
         'owner': owner,
         'is_pm': is_pm,
-        'created_at': time()
-    }
-    
-    # Clean old keys (older than 10 minutes)
-    current_time = time()
-    temp.callback_data = {
-        k: v for k, v in temp.callback_data.items()
-        if current_time - v.get('created_at', 0) < 600
+        'sort': sort,
+        'cursors': cursors or [""]
     }
     
     return key
@@ -89,9 +193,12 @@ def make_callback_key(search, offset, source_chat_id, owner, is_pm):
 # =====================================================
 # 🔓 CALLBACK KEY RETRIEVER
 # =====================================================
-def get_callback_data(key):
-    """Retrieve stored callback data"""
-    return temp.callback_data.get(key)
+async def get_callback_data(key, chat_id):
+    """Retrieve stored callback data (stored key or signed token)"""
+    data = temp.callback_data.get(key)
+    if data is None and len(key) > 12:
+        data = await unpack_callback(key, chat_id)
+    return data
 
 
 # =====================================================
@@ -113,9 +220,15 @@ def sanitize_search(text):
 # =====================================================
 # ⏱️ UPDATE MESSAGE ACTIVITY
 # =====================================================
-def update_message_activity(message_id):
-    """Update last activity time for a message"""
-    temp.message_activity[message_id] = time()
+def update_message_activity(message):
+    """(Re)start the inactivity timer of a results message"""
+    SCHEDULER.schedule(
+        f"results:{message.chat.id}:{message.id}",
+        RESULT_EXPIRE_TIME,
+        "expire_results",
+        chat_id=message.chat.id,
+        msg_id=message.id
+    )
 
 
 # =====================================================
@@ -157,7 +270,7 @@ async def filter_handler(client, message):
 
         # 🔥 auto-learn keywords (RAM only, ultra fast)
         try:
-            learn_keywords(raw_search)
+            learn_keywords(normalize_query(raw_search).text)
         except Exception as e:
             print(f"Keyword learning error: {e}")
 
@@ -239,16 +352,24 @@ async def send_results(
     source_chat_id,
     is_pm,
     message=None,
-    tried_fallback=False
+    tried_fallback=False,
+    sort=SORT_RELEVANCE,
+    cursors=None
 ):
     try:
         # Determine results per page based on PM or Group
         results_per_page = RESULTS_PER_PAGE_PM if is_pm else RESULTS_PER_PAGE_GROUP
+
+        # Keyset pagination: cursors[-1] resumes the current page
+        # (stateless buttons cannot carry cursors and use skip/limit)
+        cursors = cursors or [""]
         
-        files, next_offset, total = await get_search_results(
+        files, next_cursor, total = await get_search_results(
             search,
             offset=offset,
-            max_results=results_per_page
+            max_results=results_per_page,
+            sort=sort,
+            cursor=None if CALLBACK_STATELESS else cursors[-1]
         )
 
         # ==============================
@@ -267,7 +388,8 @@ async def send_results(
                         source_chat_id,
                         is_pm,
                         message,
-                        True
+                        True,
+                        sort
                     )
             except Exception as e:
                 print(f"Fallback suggestion error: {e}")
@@ -312,19 +434,49 @@ async def send_results(
         # -------- PAGINATION --------
         nav = []
 
-        if offset > 0:
-            callback_key = make_callback_key(search, offset - results_per_page, source_chat_id, owner, is_pm)
+        has_prev = offset > 0 and (CALLBACK_STATELESS or len(cursors) > 1)
+        if has_prev:
+            callback_key = make_callback_key(
+                search, offset - results_per_page, source_chat_id, owner, is_pm,
+                sort, cursors[:-1]
+            )
             nav.append(
                 InlineKeyboardButton("◀️ Prev", callback_data=f"page#{callback_key}")
             )
 
-        if next_offset:
-            callback_key = make_callback_key(search, offset + results_per_page, source_chat_id, owner, is_pm)
+        if next_cursor:
+            callback_key = make_callback_key(
+                search, offset + results_per_page, source_chat_id, owner, is_pm,
+                sort, cursors + [next_cursor]
+            )
             nav.append(
                 InlineKeyboardButton("Next ▶️", callback_data=f"page#{callback_key}")
             )
 
-        markup = InlineKeyboardMarkup([nav]) if nav else None
+        # -------- SORT --------
+        sort_row = []
+        for mode, label in SORT_BUTTONS:
+            if mode == sort:
+                continue
+            callback_key = make_callback_key(search, 0, source_chat_id, owner, is_pm, mode)
+            sort_row.append(
+                InlineKeyboardButton(label, callback_data=f"page#{callback_key}")
+            )
+
+        rows = [row for row in (nav, sort_row) if row]
+        markup = InlineKeyboardMarkup(rows) if rows else None
+
+        # Warm the neighbouring pages so Next / Prev hit the cache
+        if CALLBACK_STATELESS:
+            if next_cursor:
+                prefetch_search(search, offset + results_per_page, results_per_page, sort)
+            if has_prev:
+                prefetch_search(search, offset - results_per_page, results_per_page, sort)
+        else:
+            if next_cursor:
+                prefetch_search(search, offset + results_per_page, results_per_page, sort, next_cursor)
+            if len(cursors) > 1:
+                prefetch_search(search, offset - results_per_page, results_per_page, sort, cursors[-2])
 
         if message:
             # Update existing message
@@ -335,7 +487,7 @@ async def send_results(
                 parse_mode=enums.ParseMode.HTML
             )
             # Update activity time
-            update_message_activity(message.id)
+            update_message_activity(message)
         else:
             # Send new message
             msg = await client.send_message(
@@ -346,8 +498,7 @@ async def send_results(
                 parse_mode=enums.ParseMode.HTML
             )
             # Track for auto-expire
-            update_message_activity(msg.id)
-            asyncio.create_task(auto_expire(msg))
+            update_message_activity(msg)
     
     except Exception as e:
         print(f"Send results error: {e}")
@@ -370,7 +521,7 @@ async def pagination_handler(client, query):
         _, callback_key = query.data.split("#", 1)
         
         # Retrieve stored data
-        callback_data = get_callback_data(callback_key)
+        callback_data = await get_callback_data(callback_key, query.message.chat.id)
         
         if not callback_data:
             return await query.answer(
@@ -383,6 +534,8 @@ async def pagination_handler(client, query):
         source_chat_id = callback_data['source_chat_id']
         owner = callback_data['owner']
         is_pm = callback_data.get('is_pm', False)
+        sort = callback_data.get('sort', SORT_RELEVANCE)
+        cursors = callback_data.get('cursors') or [""]
 
         # Owner verification
         if query.from_user.id != owner and query.from_user.id not in ADMINS:
@@ -391,7 +544,7 @@ async def pagination_handler(client, query):
         await query.answer()
 
         # Update activity - user is interacting
-        update_message_activity(query.message.id)
+        update_message_activity(query.message)
 
         await send_results(
             client,
@@ -401,7 +554,9 @@ async def pagination_handler(client, query):
             offset,
             source_chat_id,
             is_pm,
-            query.message
+            query.message,
+            sort=sort,
+            cursors=cursors
         )
     
     except Exception as e:
@@ -415,51 +570,21 @@ async def pagination_handler(client, query):
 # =====================================================
 # ⏱ AUTO EXPIRE (SMART DELETE)
 # =====================================================
-async def auto_expire(message):
+@SCHEDULER.action("expire_results")
+async def auto_expire(client, chat_id, msg_id):
     """
-    Auto-expire message after RESULT_EXPIRE_TIME of inactivity
-    If user clicks Next/Prev, timer resets
+    Runs RESULT_EXPIRE_TIME after the last activity on a results message
+    (every Next/Prev click reschedules it)
     """
     try:
-        message_id = message.id
-        
-        while True:
-            await asyncio.sleep(RESULT_EXPIRE_TIME)
-            
-            # Check if there was recent activity
-            last_activity = temp.message_activity.get(message_id, time())
-            time_since_activity = time() - last_activity
-            
-            # If activity within expire time, reset timer
-            if time_since_activity < RESULT_EXPIRE_TIME:
-                continue
-            
-            # No activity for RESULT_EXPIRE_TIME, expire now
-            break
-        
-        # Remove buttons and show expired message
-        try:
-            await message.edit_reply_markup(None)
-            await message.edit_text("⌛ <i>This result has expired.</i>")
-        except Exception as e:
-            print(f"Expire edit error: {e}")
-            # Clean up tracking
-            temp.message_activity.pop(message_id, None)
-            return
-
-        # Wait before deletion
-        await asyncio.sleep(EXPIRE_DELETE_DELAY)
-        
-        # Delete message
-        try:
-            await message.delete()
-        except Exception as e:
-            print(f"Expire delete error: {e}")
-        
-        # Clean up tracking
-        temp.message_activity.pop(message_id, None)
-    
+        await client.edit_message_text(
+            chat_id,
+            msg_id,
+            "⌛ <i>This result has expired.</i>",
+            parse_mode=enums.ParseMode.HTML
+        )
     except Exception as e:
-        print(f"Auto expire error: {e}")
-        # Clean up on error
-        temp.message_activity.pop(message.id, None)
+        print(f"Expire edit error: {e}")
+        return
+
+    schedule_delete(chat_id, msg_id, EXPIRE_DELETE_DELAY)
@@ -1,10 +1,10 @@
 import re
-import asyncio
 from datetime import datetime, timedelta
 from hydrogram import Client, filters, enums
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from info import ADMINS, LOG_CHANNEL
 from database.users_chats_db import db
+from scheduler import schedule_delete
 
 # =========================
 # CONFIG
@@ -84,11 +84,7 @@ async def auto_delete_links(client, message):
 
     # Check if message contains link
     if LINK_REGEX.search(message.text):
-        await asyncio.sleep(LINK_DELETE_TIME)
-        try:
-            await message.delete()
-        except Exception as e:
-            print(f"Auto-delete failed: {e}")
+        schedule_delete(message.chat.id, message.id, LINK_DELETE_TIME)
 
 # =========================
 # ANTI-LINK + WARN + MUTE
@@ -182,8 +178,7 @@ async def anti_link_handler(client, message):
                     f"⚠️ {message.from_user.mention} Warning {warns}/{MAX_WARNS}\n"
                     f"Links are not allowed!"
                 )
-                await asyncio.sleep(5)
-                await warn_msg.delete()
+                schedule_delete(warn_msg.chat.id, warn_msg.id, 5)
             except:
                 pass
 
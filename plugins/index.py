@@ -6,17 +6,36 @@ from hydrogram import Client, filters, enums
 from hydrogram.errors import FloodWait, MessageNotModified
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from info import ADMINS, DATA_DATABASE_URL, DATABASE_NAME, INDEX_LOG_CHANNEL
-from database.ia_filterdb import save_file
-from utils import get_readable_time
+from info import (
+    ADMINS,
+    DATA_DATABASE_URL,
+    DATABASE_NAME,
+    INDEX_LOG_CHANNEL,
+    INDEX_CONCURRENCY,
+    INDEX_CHANNELS,
+    INDEX_CATCHUP_INTERVAL
+)
+from database.ia_filterdb import build_file_doc, save_docs_bulk, drop_unchanged, get_max_source_id
+from utils import get_readable_time, temp
+from scheduler import schedule_delete
 
 # =====================================================
 # GLOBALS
 # =====================================================
-LOCK = asyncio.Lock()
-CANCEL = False
 WAITING_SKIP = {}   # 🔥 FIX: skip state
 
+# get_messages accepts up to 200 ids per call
+BATCH_MAX = 200
+BATCH_MIN = 20
+BATCH_GROW_AFTER = 10   # clean batches before growing again
+
+# get_messages errors (not FloodWait) retried before a batch is given up
+FETCH_RETRIES = 3
+
+# forward catch-up stops after this many all-empty batches past both the
+# head and the newest live post (gaps below those are crossed)
+FORWARD_EMPTY_BATCHES = 2
+
 # =====================================================
 # RESUME DB
 # =====================================================
@@ -24,27 +43,104 @@ mongo = MongoClient(DATA_DATABASE_URL)
 db = mongo[DATABASE_NAME]
 resume_col = db["index_resume"]
 
+# next_id: next message a backwards scan resumes from
+# head_id: highest message id already indexed (forward catch-up start)
+# live_id: newest post seen by the live auto-indexer (catch-up target)
 def get_resume(chat_id):
     d = resume_col.find_one({"_id": chat_id})
-    return d["last_id"] if d else None
+    if not d:
+        return None
+    # older docs only have last_id
+    return d.get("next_id", d.get("last_id"))
+
+def set_resume(chat_id, next_id):
+    resume_col.update_one(
+        {"_id": chat_id},
+        {"$set": {"next_id": next_id, "updated_at": time.time()}, "$unset": {"last_id": ""}},
+        upsert=True
+    )
+
+def clear_resume(chat_id):
+    resume_col.update_one(
+        {"_id": chat_id},
+        {"$unset": {"next_id": "", "last_id": ""}}
+    )
+
+def get_head(chat_id):
+    """(head_id, live_id) of a channel"""
+    d = resume_col.find_one({"_id": chat_id}, {"head_id": 1, "live_id": 1})
+    if not d:
+        return None, None
+    return d.get("head_id"), d.get("live_id")
 
-def set_resume(chat_id, msg_id):
+def set_head(chat_id, head_id):
     resume_col.update_one(
         {"_id": chat_id},
-        {"$set": {"last_id": msg_id}},
+        {"$max": {"head_id": head_id}, "$set": {"updated_at": time.time()}},
+        upsert=True
+    )
+
+def set_live_head(chat_id, msg_id):
+    # not head_id itself: posts missed while offline lie below a live post
+    resume_col.update_one(
+        {"_id": chat_id},
+        {"$max": {"live_id": msg_id}},
         upsert=True
     )
 
 # =====================================================
-# HELPERS
+# RESUME CHECKPOINTS
 # =====================================================
-async def auto_delete(bot, chat_id, msg_id, delay=120):
-    await asyncio.sleep(delay)
-    try:
-        await bot.delete_messages(chat_id, msg_id)
-    except:
-        pass
+# The write stage advances the pointer after every committed batch, for
+# every outcome (saved, duplicate, error, non-media). Mongo only sees
+# it every CHECKPOINT_INTERVAL seconds and on stop / cancel / shutdown,
+# so a restart resumes exactly after the last committed batch. A batch
+# that could not be fetched freezes the pointer in front of it, so a
+# resume (or the next catch-up) reads those ids again.
+CHECKPOINT_INTERVAL = 15
+
+class Checkpoint:
+    def __init__(self, chat_id, forward=False):
+        self.chat_id = chat_id
+        self.forward = forward
+        self.next_id = None      # backwards: everything above is processed
+                                 # forward: highest processed message id
+        self.dirty = False
+        self.blocked = False     # a batch failed to fetch: stop here
+        self.flushed_at = time.monotonic()
+        self.flushes = 0
+
+    def block(self):
+        self.blocked = True
+
+    def advance(self, next_id):
+        if next_id is None or self.blocked:
+            return
+        self.next_id = next_id
+        self.dirty = True
+
+    async def maybe_flush(self):
+        if self.dirty and time.monotonic() - self.flushed_at >= CHECKPOINT_INTERVAL:
+            await self.flush()
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        # clear first: a write racing this flush re-marks it dirty
+        self.dirty = False
+        self.flushed_at = time.monotonic()
+        try:
+            save = set_head if self.forward else set_resume
+            await asyncio.to_thread(save, self.chat_id, self.next_id)
+            self.flushes += 1
+        except Exception as e:
+            # keep it dirty; the next flush retries
+            self.dirty = True
+            print(f"Checkpoint flush error ({self.chat_id}): {e}")
 
+# =====================================================
+# HELPERS
+# =====================================================
 async def send_log(bot, text):
     if not INDEX_LOG_CHANNEL:
         return
@@ -53,21 +149,209 @@ async def send_log(bot, text):
     except:
         pass
 
+# =====================================================
+# JOB MANAGER
+# =====================================================
+# Every channel gets its own job (cancel token, resume pointer,
+# progress). Jobs run concurrently up to INDEX_CONCURRENCY; the rest
+# wait on the semaphore in submission order.
+INDEX_SLOTS = asyncio.Semaphore(INDEX_CONCURRENCY)
+JOBS = {}           # chat_id -> IndexJob (queued / running)
+CANCEL_INDEX = {}   # chat_id -> cancel requested (live auto-index skips these chats)
+
+class IndexJob:
+    def __init__(self, chat_id, title, status, last_msg_id, skip, forward=False):
+        self.chat_id = chat_id
+        self.title = title
+        self.status = status     # admin message to edit (None for scheduled jobs)
+        self.last_msg_id = last_msg_id
+        self.skip = skip
+        self.forward = forward   # catch-up: scan ids newer than last_msg_id
+        self.live_id = 0         # catch-up: scan at least up to this id
+
+        self.state = "queued"
+        self.cancelled = False
+        self.created = time.time()
+        self.started = 0
+
+        self.stats = {
+            "scanned": 0,
+            "saved": 0,
+            "dup": 0,
+            "skipped": 0,        # dups known unchanged, never written
+            "err": 0,
+            "nomedia": 0,
+            "batch": BATCH_MAX
+        }
+        self.meters = {"fetch": StageMeter(), "norm": StageMeter(), "write": StageMeter()}
+        self.checkpoint = Checkpoint(chat_id, forward)
+
+    async def edit(self, text, **kwargs):
+        if not self.status:
+            return None
+        return await self.status.edit(text, **kwargs)
+
+    def cancel(self):
+        self.cancelled = True
+        CANCEL_INDEX[self.chat_id] = True
+
+    def stop_button(self):
+        return InlineKeyboardMarkup(
+            [[InlineKeyboardButton("🛑 STOP", callback_data=f"idx#cancel#{self.chat_id}")]]
+        )
+
+
+def refresh_index_stats():
+    """Aggregate running jobs into temp.INDEX_STATS (read by /admin)"""
+    running = [j for j in JOBS.values() if j.state == "running"]
+    stages = {}
+    for job in running:
+        for name, meter in job.meters.items():
+            stages[name] = stages.get(name, 0) + round(meter.rate, 1)
+
+    temp.INDEX_STATS = {
+        "running": bool(running),
+        "start": min((j.started for j in running), default=0),
+        "jobs": len(running),
+        "queued": len(JOBS) - len(running),
+        **{k: sum(j.stats[k] for j in running) for k in ("scanned", "saved", "dup", "err")},
+        "stages": stages
+    }
+
+
+def submit_job(bot, job):
+    """Register a job; it starts as soon as a slot is free"""
+    JOBS[job.chat_id] = job
+    CANCEL_INDEX[job.chat_id] = False
+    refresh_index_stats()
+    return asyncio.create_task(run_job(bot, job))
+
+
+async def run_job(bot, job):
+    try:
+        async with INDEX_SLOTS:
+            if job.cancelled:
+                await job.edit(f"❌ Cancelled before start: `{job.title}`")
+                return
+
+            job.state = "running"
+            job.started = time.time()
+            refresh_index_stats()
+            await job.edit("⚡ Indexing started…", reply_markup=job.stop_button())
+            await index_worker(bot, job)
+    except Exception as e:
+        try:
+            await job.edit(f"❌ Failed: `{e}`")
+        except:
+            pass
+    finally:
+        JOBS.pop(job.chat_id, None)
+        CANCEL_INDEX.pop(job.chat_id, None)
+        refresh_index_stats()
+
+async def flush_checkpoints():
+    """Stop every job and persist its resume pointer (bot shutdown)"""
+    for job in list(JOBS.values()):
+        job.cancel()
+        await job.checkpoint.flush()
+
+# =====================================================
+# ADMIN VIEW: RUNNING / QUEUED JOBS
+# =====================================================
+@Client.on_message(filters.command("indexjobs") & filters.user(ADMINS))
+async def index_jobs_cmd(bot, message):
+    if not JOBS:
+        return await message.reply("💤 No index jobs running")
+
+    lines = [f"📚 **Index Jobs** (limit `{INDEX_CONCURRENCY}`)\n"]
+    for job in sorted(JOBS.values(), key=lambda j: (j.state != "running", j.created)):
+        if job.state == "running":
+            elapsed = max(1, time.time() - job.started)
+            lines.append(
+                f"⚡ `{job.title}` (`{job.chat_id}`)\n"
+                f"   📊 `{job.stats['scanned']}` | ✅ `{job.stats['saved']}` | "
+                f"♻️ `{job.stats['dup']}` | ❌ `{job.stats['err']}`\n"
+                f"   🚀 `{job.stats['scanned'] / elapsed:.1f}/s` | 🧵 {stage_rates(job.meters)}"
+            )
+        else:
+            lines.append(f"⏳ `{job.title}` (`{job.chat_id}`) queued")
+
+    await message.reply("\n".join(lines))
+
+# =====================================================
+# FORWARD CATCH-UP (NEW POSTS SINCE LAST RUN)
+# =====================================================
+async def start_catchup(bot, chat, status=None):
+    """Queue a forward scan from the stored head; None if not possible"""
+    if chat.id in JOBS:
+        return None
+    head, live_id = await asyncio.to_thread(get_head, chat.id)
+    if not head:
+        # indexed before heads were kept: start from the newest stored post
+        head = await get_max_source_id(chat.id)
+        if not head:
+            return None
+        await asyncio.to_thread(set_head, chat.id, head)
+    job = IndexJob(chat.id, chat.title, status, head, 0, forward=True)
+    job.live_id = live_id or 0
+    submit_job(bot, job)
+    return job
+
+
+async def catchup_worker(bot):
+    """Periodically catch up INDEX_CHANNELS (posts missed while offline)"""
+    if not INDEX_CATCHUP_INTERVAL or not INDEX_CHANNELS:
+        return
+
+    while True:
+        for channel in INDEX_CHANNELS:
+            try:
+                chat = await bot.get_chat(channel)
+                await start_catchup(bot, chat)
+            except Exception as e:
+                print(f"Catch-up error ({channel}): {e}")
+        await asyncio.sleep(INDEX_CATCHUP_INTERVAL * 3600)
+
+
+@Client.on_message(filters.command("catchup") & filters.user(ADMINS))
+async def catchup_cmd(bot, message):
+    if len(message.command) > 1:
+        targets = [int(x) if x.lstrip("-").isdigit() else x for x in message.command[1:]]
+    else:
+        targets = INDEX_CHANNELS
+
+    if not targets:
+        return await message.reply("❌ Usage: `/catchup <channel_id>`")
+
+    lines = []
+    for target in targets:
+        try:
+            chat = await bot.get_chat(target)
+        except Exception as e:
+            lines.append(f"❌ `{target}`: `{e}`")
+            continue
+
+        if chat.id in JOBS:
+            lines.append(f"⏳ `{chat.title}` already {JOBS[chat.id].state}")
+            continue
+
+        status = await message.reply(f"⏳ Catch-up queued: `{chat.title}`")
+        if not await start_catchup(bot, chat, status):
+            await status.edit(f"⚠️ `{chat.title}`: no indexed head yet, run a full index first")
+
+    if lines:
+        await message.reply("\n".join(lines))
+
 # =====================================================
 # ENTRY POINT (OLD PYROGRAM BEHAVIOR)
 # forward / link → index
 # =====================================================
 @Client.on_message(filters.private & filters.user(ADMINS) & filters.incoming)
 async def start_index(bot, message):
-    global CANCEL
-
     # अगर skip wait चल रहा है तो ignore
     if message.from_user.id in WAITING_SKIP:
         return
 
-    if LOCK.locked():
-        return await message.reply("⏳ Indexing already running")
-
     try:
         # ---- LINK ----
         if message.text and message.text.startswith("https://t.me"):
@@ -88,6 +372,9 @@ async def start_index(bot, message):
         if chat.type != enums.ChatType.CHANNEL:
             return await message.reply("❌ Only channels supported")
 
+        if chat.id in JOBS:
+            return await message.reply(f"⏳ `{chat.title}` is already {JOBS[chat.id].state}")
+
     except Exception as e:
         return await message.reply(f"❌ Error: `{e}`")
 
@@ -145,127 +432,354 @@ async def handle_skip(bot, message):
 # =====================================================
 @Client.on_callback_query(filters.regex("^idx#"))
 async def index_callback(bot, query):
-    global CANCEL
     data = query.data.split("#")
 
     if data[1] == "close":
         return await query.message.edit("❌ Cancelled")
 
+    # ---- STOP ONE JOB ----
+    if data[1] == "cancel":
+        job = JOBS.get(int(data[2])) if len(data) > 2 else None
+        if not job:
+            return await query.answer("No such job", show_alert=True)
+        job.cancel()
+        return await query.answer("Stopping…", show_alert=True)
+
     _, _, chat_id, last_id, skip = data
-    chat = await bot.get_chat(int(chat_id))
-
-    await query.message.edit("⚡ Indexing started…")
-
-    async with LOCK:
-        CANCEL = False
-        await index_worker(
-            bot,
-            query.message,
-            int(chat_id),
-            int(last_id),
-            int(skip),
-            chat.title
+    chat_id = int(chat_id)
+
+    if chat_id in JOBS:
+        return await query.answer(f"Already {JOBS[chat_id].state}", show_alert=True)
+
+    chat = await bot.get_chat(chat_id)
+    if chat_id in JOBS:
+        return await query.answer(f"Already {JOBS[chat_id].state}", show_alert=True)
+
+    job = IndexJob(chat_id, chat.title, query.message, int(last_id), int(skip))
+
+    running = sum(1 for j in JOBS.values() if j.state == "running")
+    submit_job(bot, job)
+
+    if running >= INDEX_CONCURRENCY:
+        await query.message.edit(
+            f"⏳ Queued (#{len(JOBS) - running}) `{chat.title}`",
+            reply_markup=job.stop_button()
         )
 
 # =====================================================
-# CORE INDEX LOOP
+# CORE INDEX PIPELINE
 # =====================================================
-async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
-    global CANCEL
-
-    start_time = time.time()
-    saved = dup = err = nomedia = 0
-    processed = 0
-
-    resume_from = get_resume(chat_id)
-    current_id = resume_from if resume_from else (last_msg_id - skip)
+# fetch (Telegram) → normalize (CPU) → write (Mongo), connected by
+# bounded queues so a slow stage applies backpressure upstream while
+# Telegram and Mongo latency overlap instead of adding up.
+FETCH_QUEUE_SIZE = 4     # message batches waiting for normalization
+WRITE_QUEUE_SIZE = 4     # doc batches waiting for the DB
+PROGRESS_INTERVAL = 10   # seconds between status edits
+
+class StageMeter:
+    """Items handled and time spent working by one pipeline stage"""
+
+    def __init__(self):
+        self.items = 0
+        self.calls = 0
+        self.busy = 0.0
+
+    def add(self, items, started):
+        self.items += items
+        self.calls += 1
+        self.busy += time.perf_counter() - started
+
+    @property
+    def latency_ms(self):
+        """Average time per batch"""
+        return self.busy / self.calls * 1000 if self.calls else 0.0
+
+    @property
+    def rate(self):
+        return self.items / self.busy if self.busy else 0.0
+
+
+async def fetch_stage(bot, job, current_id, out_q):
+    """
+    Read id-range batches (backwards, or forward for catch-up);
+    adapt batch size on FloodWait
+    """
+    meter, stats = job.meters["fetch"], job.stats
+    batch_size = BATCH_MAX
+    clean_batches = 0
+    empty_run = 0
+    failures = 0
 
     try:
-        while current_id > 0:
-            if CANCEL:
-                break
+        while not job.cancelled:
+            if job.forward:
+                # ids past the channel head come back empty; a gap
+                # below the newest live post (purge) is crossed
+                if empty_run >= FORWARD_EMPTY_BATCHES and current_id > job.live_id:
+                    break
+                ids = list(range(current_id, current_id + batch_size))
+            else:
+                if current_id <= 0:
+                    break
+                ids = list(range(current_id, max(current_id - batch_size, 0), -1))
 
+            started = time.perf_counter()
             try:
-                msg = await bot.get_messages(chat_id, current_id)
+                msgs = await bot.get_messages(job.chat_id, ids)
             except FloodWait as e:
+                # back off: smaller batches until the limit settles
+                batch_size = max(BATCH_MIN, batch_size // 2)
+                clean_batches = 0
                 await asyncio.sleep(e.value)
                 continue
-            except:
-                current_id -= 1
-                continue
+            except Exception as e:
+                failures += 1
+                if failures < FETCH_RETRIES:
+                    await asyncio.sleep(2 ** failures)
+                    continue
+                # give the batch up: it is reported, never treated as read
+                print(f"Index fetch failed ({job.chat_id}, {min(ids)}-{max(ids)}): {e}")
+                msgs = None
+
+            failures = 0
+            ok = msgs is not None
+            if ok:
+                clean_batches += 1
+                if batch_size < BATCH_MAX and clean_batches >= BATCH_GROW_AFTER:
+                    batch_size = min(BATCH_MAX, batch_size * 2)
+                    clean_batches = 0
+            else:
+                msgs = []
 
-            processed += 1
+            if not isinstance(msgs, list):
+                msgs = [msgs]
 
-            if processed % 50 == 0:
-                elapsed = time.time() - start_time
-                speed = processed / elapsed if elapsed else 0
-                eta = current_id / speed if speed else 0
+            meter.add(len(ids), started)
+            stats["batch"] = batch_size
 
-                try:
-                    btn = InlineKeyboardMarkup(
-                        [[InlineKeyboardButton("🛑 STOP", callback_data="idx#cancel")]]
-                    )
-                    await status.edit(
-                        f"📊 `{processed}` scanned\n"
-                        f"✅ `{saved}` | ♻️ `{dup}` | ❌ `{err}`\n"
-                        f"⚡ `{speed:.2f}/s`\n"
-                        f"⏳ `{get_readable_time(eta)}`",
-                        reply_markup=btn
-                    )
-                except MessageNotModified:
-                    pass
-
-            if not msg or not msg.media:
-                nomedia += 1
-                current_id -= 1
-                continue
+            if job.forward:
+                # a failed batch says nothing about the channel head
+                if ok:
+                    real = any(m and not getattr(m, "empty", False) for m in msgs)
+                    empty_run = 0 if real else empty_run + 1
+                current_id += len(ids)
+                await out_q.put((ids[0], len(ids), msgs, ok))
+            else:
+                current_id -= len(ids)
+                await out_q.put((ids[-1], len(ids), msgs, ok))
+    finally:
+        await out_q.put(None)
 
-            if msg.media not in (
-                enums.MessageMediaType.VIDEO,
-                enums.MessageMediaType.DOCUMENT
-            ):
-                nomedia += 1
-                current_id -= 1
-                continue
 
-            media = getattr(msg, msg.media.value, None)
-            if not media:
-                current_id -= 1
+async def normalize_stage(job, in_q, out_q):
+    """Filter media and build files documents"""
+    meter, stats = job.meters["norm"], job.stats
+    try:
+        while True:
+            item = await in_q.get()
+            if item is None:
+                break
+
+            low_id, scanned, msgs, ok = item
+            if not ok:
+                # unread ids are errors, neither scanned nor empty
+                stats["err"] += scanned
+                await out_q.put((low_id, None, [], False))
                 continue
 
-            media.caption = msg.caption
-            res = await save_file(media)
+            started = time.perf_counter()
+            docs = []
 
-            if res == "suc":
-                saved += 1
-                set_resume(chat_id, current_id)
-            elif res == "dup":
-                dup += 1
-            else:
-                err += 1
+            nomedia = 0
+
+            for msg in msgs:
+                if not msg or getattr(msg, "empty", False) or not msg.media:
+                    nomedia += 1
+                    continue
+                if msg.media not in (
+                    enums.MessageMediaType.VIDEO,
+                    enums.MessageMediaType.DOCUMENT
+                ):
+                    nomedia += 1
+                    continue
 
-            current_id -= 1
+                media = getattr(msg, msg.media.value, None)
+                if not media:
+                    nomedia += 1
+                    continue
 
+                media.caption = msg.caption
+                try:
+                    doc = build_file_doc(media, (job.chat_id, msg.id))
+                except Exception:
+                    doc = None
+                if not doc:
+                    stats["err"] += 1
+                    continue
+                docs.append(doc)
+
+            stats["scanned"] += scanned
+            # build failures are already in err
+            stats["nomedia"] += nomedia
+            meter.add(len(msgs), started)
+
+            # highest id that really exists (forward checkpoint)
+            high_id = max(
+                (m.id for m in msgs if m and not getattr(m, "empty", False)),
+                default=None
+            )
+
+            # empty batches still move the checkpoint
+            await out_q.put((low_id, high_id, docs, True))
+    finally:
+        await out_q.put(None)
+
+
+async def write_stage(job, in_q):
+    """One bulk upsert per batch, then move the resume pointer"""
+    meter, stats = job.meters["write"], job.stats
+    while True:
+        item = await in_q.get()
+        if item is None:
+            break
+
+        low_id, high_id, docs, ok = item
+        if docs:
+            started = time.perf_counter()
+            # re-index: known, unchanged files need no write at all
+            fresh, skipped = await drop_unchanged(docs)
+            res = await save_docs_bulk(fresh)
+            meter.add(len(docs), started)
+
+            stats["dup"] += skipped
+            stats["skipped"] += skipped
+            stats["saved"] += res["suc"]
+            stats["dup"] += res["dup"]
+            stats["err"] += res["err"]
+
+        # batch is committed: move the resume pointer past it (never
+        # past a batch that was not read)
+        if not ok:
+            job.checkpoint.block()
+        job.checkpoint.advance(high_id if job.forward else low_id - 1)
+        await job.checkpoint.maybe_flush()
+
+
+def stage_rates(meters):
+    return " | ".join(f"{name} `{m.rate:.0f}/s`" for name, m in meters.items())
+
+
+async def report_progress(job, remaining):
+    """Periodic status edits + temp.INDEX_STATS for /admin"""
+    stats, meters = job.stats, job.meters
+    btn = job.stop_button()
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+
+        elapsed = time.time() - job.started
+        speed = stats["scanned"] / elapsed if elapsed else 0
+        left = max(remaining - stats["scanned"], 0)
+        eta = left / speed if speed else 0
+        refresh_index_stats()
+        if not job.status:
+            continue
+
+        try:
+            await job.edit(
+                f"📊 `{stats['scanned']}` scanned\n"
+                f"✅ `{stats['saved']}` | ♻️ `{stats['dup']}` | ❌ `{stats['err']}`\n"
+                f"⚡ `{speed:.2f}/s` | 📦 `{stats['batch']}`/batch\n"
+                f"🧵 {stage_rates(meters)}\n"
+                f"⏳ `{get_readable_time(eta)}`",
+                reply_markup=btn
+            )
+        except MessageNotModified:
+            pass
+        except Exception:
+            pass
+
+
+async def index_worker(bot, job):
+    chat_id, channel_title = job.chat_id, job.title
+    start_time = job.started or time.time()
+
+    if job.forward:
+        # catch-up: everything up to the stored head is indexed
+        current_id = job.last_msg_id + 1
+        remaining = 0
+    else:
+        resume_from = await asyncio.to_thread(get_resume, chat_id)
+        current_id = resume_from if resume_from else (job.last_msg_id - job.skip)
+        remaining = current_id
+
+    stats, meters = job.stats, job.meters
+
+    fetch_q = asyncio.Queue(maxsize=FETCH_QUEUE_SIZE)
+    write_q = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+
+    stages = [
+        asyncio.create_task(fetch_stage(bot, job, current_id, fetch_q)),
+        asyncio.create_task(normalize_stage(job, fetch_q, write_q)),
+        asyncio.create_task(write_stage(job, write_q)),
+    ]
+    reporter = asyncio.create_task(report_progress(job, remaining))
+
+    try:
+        await asyncio.gather(*stages)
     except Exception as e:
-        await status.edit(f"❌ Failed: `{e}`")
+        for task in stages:
+            task.cancel()
+        await job.edit(f"❌ Failed: `{e}`")
         return
-
+    finally:
+        reporter.cancel()
+        await job.checkpoint.flush()
+
+    # a finished full scan starts fresh next time and sets the head
+    # that forward catch-ups start from; with unread batches the resume
+    # pointer is kept so the next run retries them
+    incomplete = job.checkpoint.blocked
+    if not job.cancelled and not job.forward:
+        if not incomplete:
+            await asyncio.to_thread(clear_resume, chat_id)
+        await asyncio.to_thread(set_head, chat_id, job.last_msg_id)
+    elif not job.cancelled and not incomplete and job.live_id:
+        # every id up to the newest live post was read: the head may
+        # move past trailing gaps too
+        await asyncio.to_thread(set_head, chat_id, job.live_id)
+
+    saved, dup, err, nomedia = stats["saved"], stats["dup"], stats["err"], stats["nomedia"]
     total_time = get_readable_time(time.time() - start_time)
 
+    if job.cancelled:
+        headline = "🛑 **Index Stopped**"
+    elif incomplete:
+        headline = "⚠️ **Index Incomplete** (unread batches, run again to resume)"
+    elif job.forward:
+        headline = "✅ **Catch-up Completed**"
+    else:
+        headline = "✅ **Index Completed**"
+
     # ---- ADMIN CHAT (AUTO DELETE) ----
-    final_msg = await status.edit(
-        f"✅ **Index Completed**\n\n"
+    final_msg = await job.edit(
+        f"{headline}\n\n"
         f"📢 `{channel_title}`\n"
         f"🆔 `{chat_id}`\n\n"
         f"✅ `{saved}` | ♻️ `{dup}` | ❌ `{err}` | 🚫 `{nomedia}`\n"
+        f"🧵 {stage_rates(meters)}\n"
         f"⏱ `{total_time}`"
     )
-    asyncio.create_task(auto_delete(bot, final_msg.chat.id, final_msg.id, 120))
+    if final_msg:
+        schedule_delete(final_msg.chat.id, final_msg.id, 120)
+
+    # scheduled catch-ups with nothing new stay out of the log
+    if job.forward and not job.status and not (saved or dup or err):
+        return
 
     # ---- PERMANENT LOG CHANNEL ----
     await send_log(
         bot,
-        "📊 **Index Report**\n\n"
+        f"📊 **{'Catch-up' if job.forward else 'Index'} Report**\n\n"
         f"📢 **Channel:** `{channel_title}`\n"
         f"🆔 **Channel ID:** `{chat_id}`\n\n"
         f"✅ **Saved:** `{saved}`\n"
@@ -274,12 +788,3 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
         f"🚫 **Non-media:** `{nomedia}`\n"
         f"⏱ **Time:** `{total_time}`"
     )
-
-# =====================================================
-# STOP
-# =====================================================
-@Client.on_callback_query(filters.regex("^idx#cancel"))
-async def stop_index(bot, query):
-    global CANCEL
-    CANCEL = True
-    await query.answer("Stopping…", show_alert=True)
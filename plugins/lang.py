@@ -47,8 +47,7 @@ async def get_lang(chat_id: int, user_id: int, text: str = "") -> str:
 
     # ---------- PM OVERRIDE ----------
     if chat_id == user_id:
-        user = await db.get_user(user_id)
-        lang = user.get("lang") if user else None
+        lang = (await db.get_user_context(user_id))["lang"]
         if lang in LANGS and lang != "auto":
             return lang
 
@@ -76,8 +75,7 @@ async def lang_cmd(client: Client, message: Message):
     args = message.text.split(maxsplit=1)
 
     if len(args) == 1:
-        user = await db.get_user(message.from_user.id)
-        cur = user.get("lang", "auto") if user else "auto"
+        cur = (await db.get_user_context(message.from_user.id))["lang"]
 
         return await message.reply(
             "🌍 <b>Language Settings</b>\n\n"
@@ -100,6 +98,7 @@ async def lang_cmd(client: Client, message: Message):
             "• <code>auto</code>"
         )
 
+    # update_user drops the cached user context
     await db.update_user(
         message.from_user.id,
         {"lang": lang}
@@ -89,7 +89,7 @@ async def premium_callbacks(client, query: CallbackQuery):
         days = int(action.split("_")[-1])
         limit = now + timedelta(days=days)
 
-        users = db.get_premium_users()
+        users = await db.get_expiring(limit)
         result = []
 
         for u in users:
@@ -128,7 +128,7 @@ async def premium_callbacks(client, query: CallbackQuery):
     # 📊 EXPIRY CHART (TEXT BASED)
     # ==================================================
     elif action == "prm_chart":
-        users = db.get_premium_users()
+        users = await db.get_premium_users()
 
         c_3 = c_7 = c_30 = c_30p = 0
 
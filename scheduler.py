@@ -0,0 +1,278 @@
+import time
+import heapq
+import asyncio
+
+from hydrogram.errors import FloodWait, BadRequest, Forbidden
+
+from database.users_chats_db import db
+
+
+# ======================================================
+# ⏲ DEFERRED ACTION SCHEDULER
+# ======================================================
+# One heap and one worker for every "do this later" in the bot (result
+# expiry, file auto-delete, link auto-delete, status cleanup) instead of
+# one sleeping task per message. Entries are keyed, so rescheduling an
+# existing key to a later time is a dict update; the heap item left
+# behind is re-pushed when it surfaces. Pending entries are written to
+# the `deferred` collection every few seconds and reloaded on start.
+
+PERSIST_INTERVAL = 5     # seconds between persistence flushes
+MAX_INFLIGHT = 20        # actions running at the same time
+IDLE_WAKE = 60           # max sleep when the heap is empty
+
+
+class DeferredScheduler:
+    def __init__(self):
+        self.actions = {}       # name -> async handler(bot, **args)
+        self.entries = {}       # key -> {"due", "action", "args"}
+        self.heap = []          # (due, key); may hold stale items
+        self.dirty = set()      # keys to upsert on the next flush
+        self.removed = set()    # keys to delete on the next flush
+        self.wake = asyncio.Event()
+        self.next_wake = 0.0
+        self.slots = asyncio.Semaphore(MAX_INFLIGHT)
+        self.bot = None
+        self.stats = {"scheduled": 0, "fired": 0, "failed": 0}
+
+    # -------------------------------------------------
+    # registration
+    # -------------------------------------------------
+    def action(self, name: str):
+        """Decorator registering a handler for persisted entries"""
+        def register(func):
+            self.actions[name] = func
+            return func
+        return register
+
+    # -------------------------------------------------
+    # public API
+    # -------------------------------------------------
+    def schedule(self, key: str, delay: float, action: str, **args):
+        """Run `action` after `delay`; an existing key is moved, not duplicated"""
+        due = time.time() + delay
+        entry = self.entries.get(key)
+        pushed_earlier = entry is None or due < entry["due"]
+
+        self.entries[key] = {"due": due, "action": action, "args": args}
+        self.dirty.add(key)
+        self.removed.discard(key)
+        self.stats["scheduled"] += 1
+
+        # later due: the old heap item re-pushes itself when it surfaces
+        if pushed_earlier:
+            heapq.heappush(self.heap, (due, key))
+            if due < self.next_wake:
+                self.wake.set()
+
+    def cancel(self, key: str) -> bool:
+        if self.entries.pop(key, None) is None:
+            return False
+        self.dirty.discard(key)
+        self.removed.add(key)
+        return True
+
+    def pending(self, key: str) -> bool:
+        return key in self.entries
+
+    # -------------------------------------------------
+    # worker
+    # -------------------------------------------------
+    def _pop_due(self, now: float):
+        due_entries = []
+        while self.heap and self.heap[0][0] <= now:
+            due, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            if entry["due"] > due:
+                heapq.heappush(self.heap, (entry["due"], key))
+                continue
+            del self.entries[key]
+            self.dirty.discard(key)
+            self.removed.add(key)
+            due_entries.append((key, entry))
+        return due_entries
+
+    async def _fire(self, key: str, entry: dict):
+        async with self.slots:
+            handler = self.actions.get(entry["action"])
+            if handler is None:
+                print(f"Deferred: no handler for {entry['action']} ({key})")
+                return
+            try:
+                await handler(self.bot, **entry["args"])
+                self.stats["fired"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"Deferred {entry['action']} error ({key}): {e}")
+
+    async def run(self, bot):
+        self.bot = bot
+        await self.load()
+        asyncio.create_task(self._persist_loop())
+
+        while True:
+            now = time.time()
+            for key, entry in self._pop_due(now):
+                asyncio.create_task(self._fire(key, entry))
+
+            self.next_wake = self.heap[0][0] if self.heap else now + IDLE_WAKE
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), max(0.0, self.next_wake - time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    # -------------------------------------------------
+    # persistence
+    # -------------------------------------------------
+    async def load(self):
+        try:
+            docs = await db.get_deferred()
+        except Exception as e:
+            print(f"Deferred load error: {e}")
+            return
+
+        for d in docs:
+            key = d["_id"]
+            if key in self.entries:
+                continue
+            self.entries[key] = {"due": d["due"], "action": d["action"], "args": d.get("args", {})}
+            heapq.heappush(self.heap, (d["due"], key))
+        print(f"⏲ Deferred actions restored: {len(docs)}")
+
+    async def flush(self):
+        if not self.dirty and not self.removed:
+            return
+        dirty, removed = self.dirty, self.removed
+        self.dirty, self.removed = set(), set()
+
+        upserts = [
+            {"_id": key, **self.entries[key]}
+            for key in dirty if key in self.entries
+        ]
+        try:
+            await db.save_deferred(upserts, list(removed))
+        except Exception as e:
+            # retry on the next flush
+            self.dirty |= {key for key in dirty if key in self.entries}
+            self.removed |= removed
+            print(f"Deferred flush error: {e}")
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(PERSIST_INTERVAL)
+            await self.flush()
+
+
+SCHEDULER = DeferredScheduler()
+
+
+# ======================================================
+# 🧺 DELETE COALESCER (PER CHAT)
+# ======================================================
+# Due deletions for a chat are collected for DELETE_WINDOW and sent as
+# one delete_messages call per DELETE_BATCH ids. Transient failures are
+# retried with backoff; a batch Telegram rejects outright is split in
+# half so one undeletable message does not keep the rest alive.
+DELETE_WINDOW = 1.5      # seconds deletions are collected per chat
+DELETE_BATCH = 100       # ids per delete_messages call (API limit)
+DELETE_RETRIES = 3
+
+
+class DeleteCoalescer:
+    def __init__(self):
+        self.pending = {}   # chat_id -> set(msg_id)
+        self.timers = {}    # chat_id -> delayed flush task
+        self.stats = {"queued": 0, "deleted": 0, "calls": 0, "retries": 0, "failed": 0}
+
+    def add(self, bot, chat_id, msg_ids):
+        self.pending.setdefault(chat_id, set()).update(msg_ids)
+        self.stats["queued"] += len(msg_ids)
+        if chat_id not in self.timers:
+            self.timers[chat_id] = asyncio.create_task(self._flush_later(bot, chat_id))
+
+    async def _flush_later(self, bot, chat_id):
+        await asyncio.sleep(DELETE_WINDOW)
+        self.timers.pop(chat_id, None)
+        await self.flush(bot, chat_id)
+
+    async def flush(self, bot, chat_id):
+        ids = sorted(self.pending.pop(chat_id, ()))
+        for i in range(0, len(ids), DELETE_BATCH):
+            await self._delete(bot, chat_id, ids[i:i + DELETE_BATCH])
+
+    async def _delete(self, bot, chat_id, ids):
+        for attempt in range(DELETE_RETRIES):
+            try:
+                self.stats["calls"] += 1
+                deleted = await bot.delete_messages(chat_id, ids)
+                self.stats["deleted"] += deleted if isinstance(deleted, int) else len(ids)
+                return
+            except FloodWait as e:
+                await asyncio.sleep(e.value)
+            except (BadRequest, Forbidden) as e:
+                # retrying the same batch will not help
+                if len(ids) > 1:
+                    mid = len(ids) // 2
+                    await self._delete(bot, chat_id, ids[:mid])
+                    await self._delete(bot, chat_id, ids[mid:])
+                    return
+                self.stats["failed"] += 1
+                print(f"Delete failed ({chat_id}/{ids[0]}): {e}")
+                return
+            except Exception as e:
+                print(f"Delete batch error ({chat_id}, {len(ids)} ids): {e}")
+                await asyncio.sleep(2 ** attempt)
+            self.stats["retries"] += 1
+
+        self.stats["failed"] += len(ids)
+
+    async def flush_all(self, bot):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        for chat_id in list(self.pending):
+            await self.flush(bot, chat_id)
+
+
+DELETER = DeleteCoalescer()
+
+
+def delete_later(bot, chat_id: int, msg_ids):
+    """Queue messages for the next batched delete of their chat"""
+    if isinstance(msg_ids, int):
+        msg_ids = [msg_ids]
+    DELETER.add(bot, chat_id, msg_ids)
+
+
+# ======================================================
+# 🗑 SHARED ACTIONS
+# ======================================================
+@SCHEDULER.action("delete")
+async def _delete_message(bot, chat_id, msg_id):
+    delete_later(bot, chat_id, msg_id)
+
+
+def schedule_delete(chat_id: int, msg_id: int, delay: float):
+    """Delete a message after `delay` seconds (survives restarts)"""
+    SCHEDULER.schedule(f"del:{chat_id}:{msg_id}", delay, "delete", chat_id=chat_id, msg_id=msg_id)
+
+
+async def deferred_worker(bot):
+    await SCHEDULER.run(bot)
+
+
+def deferred_stats():
+    return {
+        "pending": len(SCHEDULER.entries),
+        **SCHEDULER.stats,
+        "deletes": dict(DELETER.stats, waiting=sum(map(len, DELETER.pending.values())))
+    }
+
+
+async def flush_deferred(bot):
+    """Run queued deletes and persist pending actions (bot shutdown)"""
+    await DELETER.flush_all(bot)
+    await SCHEDULER.flush()
@@ -1,16 +1,18 @@
 import asyncio
+import heapq
 import pytz
 import qrcode
 import time
 import random
 from io import BytesIO
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from hydrogram.errors import UserNotParticipant, FloodWait
 from hydrogram.types import InlineKeyboardButton
 
 from info import ADMINS, IS_PREMIUM, TIME_ZONE
 from database.users_chats_db import db
+from database.cache import LRUCache
 from shortzy import Shortzy
 
 
@@ -24,6 +26,13 @@ except ImportError:
     SHORTLINK_URL = None
 
 
+# ======================================================
+# 👑 PREMIUM CONFIG (Koyeb Optimized)
+# ======================================================
+
+GRACE_PERIOD = timedelta(minutes=20)
+
+
 # ======================================================
 # 🧠 GLOBAL RUNTIME STATE (Koyeb Optimized)
 # ======================================================
@@ -36,11 +45,11 @@ class temp(object):
     U_NAME = None
     B_NAME = None
 
-    SETTINGS = {}
-    VERIFICATIONS = {}
+    # bounded LRU caches (dict-style access)
+    SETTINGS = LRUCache("settings", max_items=5000, ttl=600)
+    # premium / ban / verify / lang live in db.user_ctx
 
     FILES = {}          # msg_id -> delivery data
-    PREMIUM = {}        # RAM premium cache
     KEYWORDS = {}       # learned keywords (RAM)
 
     LANG_USER = {}      # user_id -> hi/en
@@ -57,16 +66,7 @@ class temp(object):
     
     # Koyeb optimization flags
     _cleanup_running = False
-    _watcher_running = False
-    _reminder_running = False
-
-
-# ======================================================
-# 👑 PREMIUM CONFIG (Koyeb Optimized)
-# ======================================================
-
-GRACE_PERIOD = timedelta(minutes=20)
-PREMIUM_CACHE_TTL = 600  # 10 min cache (increased for Koyeb)
+    _expiry_running = False
 
 
 # ======================================================
@@ -74,30 +74,24 @@ PREMIUM_CACHE_TTL = 600  # 10 min cache (increased for Koyeb)
 # ======================================================
 
 async def is_premium(user_id, bot=None) -> bool:
-    """Koyeb optimized premium check with extended cache"""
+    """Koyeb optimized premium check (served from the user context cache)"""
     if not IS_PREMIUM or user_id in ADMINS:
         return True
 
-    now_ts = time.time()
-    cached = temp.PREMIUM.get(user_id)
-
-    if cached and now_ts - cached["checked_at"] < PREMIUM_CACHE_TTL:
-        expire = cached["expire"]
-        return bool(expire and datetime.utcnow() <= expire + GRACE_PERIOD)
-
     try:
-        plan = db.get_plan(user_id)
+        plan = await db.get_plan(user_id)
     except Exception as e:
         print(f"[KOYEB] DB error in is_premium: {e}")
         return False
 
     if not plan or not plan.get("premium"):
-        temp.PREMIUM[user_id] = {"expire": None, "checked_at": now_ts}
         return False
 
     expire = plan.get("expire")
     if isinstance(expire, (int, float)):
         expire = datetime.utcfromtimestamp(expire)
+    if not expire:
+        return False
 
     if datetime.utcnow() > expire + GRACE_PERIOD:
         try:
@@ -107,135 +101,166 @@ async def is_premium(user_id, bot=None) -> bool:
                 "plan": "",
                 "last_reminder": "expired"
             })
-            db.update_plan(user_id, plan)
+            # also drops the cached user context
+            await db.update_plan(user_id, plan)
         except Exception as e:
             print(f"[KOYEB] DB error updating expired plan: {e}")
-        
-        temp.PREMIUM[user_id] = {"expire": None, "checked_at": now_ts}
         return False
 
-    temp.PREMIUM[user_id] = {"expire": expire, "checked_at": now_ts}
     return True
 
 
 # ======================================================
-# 🛡 PREMIUM WATCHER (Koyeb Optimized)
-# ======================================================
-
-async def check_premium(bot):
-    """Koyeb optimized premium watcher with error handling"""
-    if temp._watcher_running:
-        return
-    
-    temp._watcher_running = True
-    
-    while True:
-        try:
-            now = datetime.utcnow()
-            users = db.get_premium_users()
-            
-            for u in users:
-                try:
-                    uid = u["id"]
-                    if uid in ADMINS:
-                        continue
-
-                    plan = u.get("plan", {})
-                    expire = plan.get("expire")
-                    if not expire:
-                        continue
-
-                    if isinstance(expire, (int, float)):
-                        expire = datetime.utcfromtimestamp(expire)
-
-                    if now > expire + GRACE_PERIOD:
-                        plan.update({"premium": False, "expire": "", "plan": ""})
-                        db.update_plan(uid, plan)
-                        temp.PREMIUM.pop(uid, None)
-                
-                except Exception as e:
-                    print(f"[KOYEB] Error checking user {uid}: {e}")
-                    continue
-                    
-                # Small delay to prevent CPU spike on Koyeb
-                await asyncio.sleep(0.1)
-                
-        except Exception as e:
-            print(f"[KOYEB] Premium watcher error: {e}")
-        
-        # Longer sleep for Koyeb (30 min)
-        await asyncio.sleep(1800)
-
-
-# ======================================================
-# 🔔 PREMIUM EXPIRY REMINDER (Koyeb Optimized)
+# ⏳ PREMIUM EXPIRY ENGINE (indexed window + timer heap)
 # ======================================================
+# Only plans whose expiry or reminder boundary falls in the next
+# EXPIRY_WINDOW are loaded (plan.expire index). Their boundaries go on a
+# heap and fire on time; expirations due together are applied with one
+# update_many and reminders are sent through a rate-limited queue.
 
 REMINDER_STEPS = [
     ("1d", timedelta(days=1)),
     ("6h", timedelta(hours=6)),
     ("1h", timedelta(hours=1))
 ]
+REMINDER_RANK = {tag: i for i, (tag, _) in enumerate(REMINDER_STEPS)}
 
-async def premium_expiry_reminder(bot):
-    """Koyeb optimized reminder with batch processing"""
-    if temp._reminder_running:
-        return
-    
-    temp._reminder_running = True
-    
-    while True:
-        try:
-            now = datetime.utcnow()
-            users = db.get_premium_users()
-            
-            for user in users:
+EXPIRY_WINDOW = 3600     # seconds of boundaries loaded per scan
+EXPIRY_RESCAN = 900      # < window, so plans bought mid-window are picked up
+REMINDER_RATE = 10       # reminder messages per second at most
+
+
+def expire_ts(expire):
+    """plan.expire (datetime / unix ts / "") -> unix ts or None"""
+    if isinstance(expire, (int, float)):
+        return float(expire)
+    if isinstance(expire, datetime):
+        return expire.replace(tzinfo=timezone.utc).timestamp()
+    return None
+
+
+def due_reminder(expire_at, now):
+    """Tightest reminder step whose boundary has passed, or None"""
+    if now >= expire_at:
+        return None
+    due = None
+    for tag, delta in REMINDER_STEPS:
+        if now >= expire_at - delta.total_seconds():
+            due = tag
+    return due
+
+
+class PremiumExpiry:
+    def __init__(self):
+        self.heap = []           # (fire_at, kind, user_id)
+        self.scheduled = set()   # heap entries already pushed this window
+        self.reminders = asyncio.Queue()
+        self.stats = {"expired": 0, "reminded": 0}
+
+    def push(self, at, kind, user_id):
+        entry = (at, kind, user_id)
+        if entry not in self.scheduled:
+            self.scheduled.add(entry)
+            heapq.heappush(self.heap, entry)
+
+    async def scan(self):
+        now = time.time()
+        horizon = now + EXPIRY_WINDOW
+        lead = REMINDER_STEPS[0][1]
+        grace = GRACE_PERIOD.total_seconds()
+
+        # forget fired entries the query can no longer return
+        oldest = now - lead.total_seconds() - grace
+        self.scheduled = {e for e in self.scheduled if e[0] >= oldest}
+
+        users = await db.get_expiring(datetime.utcfromtimestamp(horizon) + lead)
+        for u in users:
+            uid = u["id"]
+            if uid in ADMINS:
+                continue
+            plan = u.get("plan", {})
+            exp = expire_ts(plan.get("expire"))
+            if exp is None:
+                continue
+
+            if exp + grace <= horizon:
+                self.push(exp + grace, "expire", uid)
+            if now >= exp:
+                continue
+            for tag, delta in REMINDER_STEPS:
+                at = exp - delta.total_seconds()
+                if at <= horizon and REMINDER_RANK.get(plan.get("last_reminder"), -1) < REMINDER_RANK[tag]:
+                    self.push(at, "remind", uid)
+
+    async def run(self):
+        next_scan = 0
+        while True:
+            now = time.time()
+            if now >= next_scan:
                 try:
-                    uid = user["id"]
-                    if uid in ADMINS:
-                        continue
-
-                    plan = user.get("plan", {})
-                    expire = plan.get("expire")
-                    last = plan.get("last_reminder")
-
-                    if not expire:
-                        continue
-
-                    if isinstance(expire, (int, float)):
-                        expire = datetime.utcfromtimestamp(expire)
-
-                    for tag, delta in REMINDER_STEPS:
-                        if last == tag:
-                            continue
-                        if expire - delta <= now < expire:
-                            try:
-                                await bot.send_message(
-                                    uid,
-                                    "⏰ **Premium Expiry Alert**\n\n"
-                                    f"Your premium will expire in **{tag}**.\n"
-                                    "Renew now to avoid interruption."
-                                )
-                                plan["last_reminder"] = tag
-                                db.update_plan(uid, plan)
-                            except FloodWait as e:
-                                await asyncio.sleep(e.value)
-                            except Exception as e:
-                                print(f"[KOYEB] Reminder send error: {e}")
-                            break
-                    
-                    # Prevent CPU spike
-                    await asyncio.sleep(0.2)
-                    
+                    await self.scan()
                 except Exception as e:
-                    print(f"[KOYEB] Error processing reminder for {uid}: {e}")
-                    continue
-                    
-        except Exception as e:
-            print(f"[KOYEB] Reminder error: {e}")
-        
-        # 30 min sleep
-        await asyncio.sleep(1800)
+                    print(f"[KOYEB] Premium expiry scan error: {e}")
+                next_scan = now + EXPIRY_RESCAN
+
+            expired = []
+            while self.heap and self.heap[0][0] <= now:
+                _, kind, uid = heapq.heappop(self.heap)
+                if kind == "expire":
+                    expired.append(uid)
+                else:
+                    self.reminders.put_nowait(uid)
+
+            if expired:
+                try:
+                    cutoff = datetime.utcfromtimestamp(now) - GRACE_PERIOD
+                    self.stats["expired"] += await db.expire_plans(expired, cutoff)
+                except Exception as e:
+                    print(f"[KOYEB] Premium expire error: {e}")
+
+            wake = min(next_scan, self.heap[0][0]) if self.heap else next_scan
+            await asyncio.sleep(max(0.0, wake - time.time()))
+
+    async def send_reminders(self, bot):
+        while True:
+            uid = await self.reminders.get()
+            try:
+                # re-read: the plan may have been renewed since the scan
+                plan = await db.get_plan(uid)
+                exp = expire_ts(plan.get("expire")) if plan.get("premium") else None
+                tag = due_reminder(exp, time.time()) if exp else None
+                if tag and REMINDER_RANK.get(plan.get("last_reminder"), -1) < REMINDER_RANK[tag]:
+                    await self.send(bot, uid, tag)
+            except Exception as e:
+                print(f"[KOYEB] Reminder send error: {e}")
+            await asyncio.sleep(1 / REMINDER_RATE)
+
+    async def send(self, bot, uid, tag):
+        text = (
+            "⏰ **Premium Expiry Alert**\n\n"
+            f"Your premium will expire in **{tag}**.\n"
+            "Renew now to avoid interruption."
+        )
+        try:
+            await bot.send_message(uid, text)
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
+            await bot.send_message(uid, text)
+        await db.set_last_reminder(uid, tag)
+        self.stats["reminded"] += 1
+
+
+PREMIUM_EXPIRY = PremiumExpiry()
+
+
+async def premium_expiry_worker(bot):
+    """Expires plans and sends reminders (replaces the full-scan loops)"""
+    if temp._expiry_running:
+        return
+
+    temp._expiry_running = True
+    asyncio.create_task(PREMIUM_EXPIRY.send_reminders(bot))
+    await PREMIUM_EXPIRY.run()
 
 
 # ======================================================
@@ -243,11 +268,9 @@ async def premium_expiry_reminder(bot):
 # ======================================================
 
 async def get_verify_status(user_id: int):
-    """Get verification status with error handling"""
+    """Get verification status (served from the user context cache)"""
     try:
-        if user_id not in temp.VERIFICATIONS:
-            temp.VERIFICATIONS[user_id] = await db.get_verify_status(user_id)
-        return temp.VERIFICATIONS[user_id]
+        return await db.get_verify_status(user_id)
     except Exception as e:
         print(f"[KOYEB] Verify status error: {e}")
         return {}
@@ -258,7 +281,6 @@ async def update_verify_status(user_id: int, **kwargs):
     try:
         verify = await get_verify_status(user_id)
         verify.update(kwargs)
-        temp.VERIFICATIONS[user_id] = verify
         await db.update_verify_status(user_id, verify)
     except Exception as e:
         print(f"[KOYEB] Update verify error: {e}")
@@ -420,12 +442,6 @@ async def cleanup_files_memory():
             # Remove in batch
             for k in expired_keys:
                 temp.FILES.pop(k, None)
-            
-            # Also cleanup old cache entries
-            if len(temp.PREMIUM) > 1000:
-                old_keys = list(temp.PREMIUM.keys())[:500]
-                for k in old_keys:
-                    temp.PREMIUM.pop(k, None)
                     
         except Exception as e:
             print(f"[KOYEB] Cleanup error: {e}")
@@ -598,9 +614,11 @@ def get_readable_time(seconds):
 async def get_settings(group_id):
     """Get group settings with caching"""
     try:
-        if group_id not in temp.SETTINGS:
-            temp.SETTINGS[group_id] = await db.get_settings(group_id)
-        return temp.SETTINGS[group_id]
+        settings = temp.SETTINGS.get(group_id)
+        if settings is None:
+            settings = await db.get_settings(group_id)
+            temp.SETTINGS[group_id] = settings
+        return settings
     except Exception as e:
         print(f"[KOYEB] Settings error: {e}")
         return {}